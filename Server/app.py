@@ -1,16 +1,57 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from datetime import datetime
 import os
 from dotenv import load_dotenv
-from functions import execute_function, get_stock_context
+from functions import execute_function, negative_cache, quote_router
+from market_snapshot import market_snapshot, MARKET_SYMBOLS
+from quote_stream import quote_stream, parse_symbols
 from database import db
 from auth import auth_manager, require_auth
 from cost_monitor import cost_monitor
+from cache_manager import api_cache
+from request_coalescer import request_coalescer
+from http_client import http_client_stats
+from parallel_executor import upstream_executor, analytics_executor, refresh_executor, fundamentals_executor
+from quota_governor import alpha_vantage_quota
+from history_store import history_store
+from indicators import indicator_engine
+from portfolio_snapshots import portfolio_snapshots, validate_holdings
+from symbol_master import symbol_master
+from intent_classifier import intent_router, OPEN_INTENT
+from response_cache import llm_response_cache
+from chat_stream import chat_stream
+from chat_pipeline import chat_pipeline, Stage
 import logging
+import time
 import uuid
 import re
 
+# Recent conversation turns placed in the LLM prompt, and the characters kept from each
+HISTORY_TURNS = 6
+HISTORY_TURN_CHARS = 500
+
+def fallback_response(message: str, stock_data: dict = None) -> str:
+    """Template reply used when the LLM is unavailable or not needed"""
+    words = set(re.findall(r'\b\w+\b', message.lower()))
+    
+    if stock_data and 'error' not in stock_data:
+        return f"📊 **{stock_data.get('symbol')} Live Data**\n\n**Price:** ₹{stock_data.get('current_price')}\n**High:** ₹{stock_data.get('high')}\n**Low:** ₹{stock_data.get('low')}\n**Volume:** {stock_data.get('volume')}"
+    
+    if any(w in words for w in ['hi', 'hello', 'hey', 'namaste', 'morning', 'afternoon', 'evening']):
+        return "Hello! I'm Saytrix AI, your financial assistant. Ask me about stocks, portfolio management, or market insights!"
+    
+    if any(w in words for w in ['portfolio', 'holdings', 'pnl']) or 'p&l' in message.lower():
+        return "💼 Use the Portfolio Calculator in the sidebar to manage your investments and calculate P&L."
+    
+    if any(w in words for w in ['market', 'nifty', 'sensex']):
+        return "📈 Check the live market widgets in the sidebar for current market data and trends."
+    
+    if any(w in words for w in ['stock', 'share', 'price']):
+        return "📊 I can help you get stock prices! Try asking about specific stocks or use the sidebar tools!"
+    
+    return f"I can help with stock analysis, portfolio management, and market insights. Try asking about specific stocks or use the sidebar tools!"
+
 # Enhanced Gemini Integration
 try:
     import google.generativeai as genai
@@ -20,17 +61,14 @@ try:
             api_key = os.getenv('GEMINI_API_KEY')
             if api_key:
                 genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel('gemini-1.5-flash')
+                self.model_name = 'gemini-1.5-flash'
+                self.model = genai.GenerativeModel(self.model_name)
                 self.available = True
             else:
                 self.available = False
         
-        def get_response(self, message: str, stock_data: dict = None) -> str:
-            if not self.available:
-                return self._fallback_response(message, stock_data)
-            
-            try:
-                system_prompt = f"""You are Saytrix AI, a financial assistant. STRICT RULES:
+        def _prompt(self, message: str, grounding: str) -> str:
+            return f"""You are Saytrix AI, a financial assistant. STRICT RULES:
 1. ONLY use data provided below - NEVER invent numbers
 2. If data missing, say "Data not available"
 3. Be helpful but factual only
@@ -38,40 +76,76 @@ try:
 
 USER MESSAGE: {message}
 
-PROVIDED DATA: {self._format_data(stock_data) if stock_data else 'No stock data provided'}
+PROVIDED DATA: {grounding}
 
 Respond helpfully using ONLY the provided information:"""
-
-                response = self.model.generate_content(system_prompt)
-                return response.text
+        
+        def _grounding(self, message: str, stock_data: dict = None, history: list = None) -> str:
+            """Everything the prompt holds besides the message: quote data, then recent turns"""
+            grounding = self._format_data(stock_data) if stock_data else 'No stock data provided'
+            conversation = self._format_history(message, history)
+            return f"{grounding}\n\nRECENT CONVERSATION:\n{conversation}" if conversation else grounding
+        
+        def get_response(self, message: str, stock_data: dict = None, intent: str = OPEN_INTENT,
+                         history: list = None) -> str:
+            if not self.available:
+                return self._fallback_response(message, stock_data)
+            
+            grounding = self._grounding(message, stock_data, history)
+            try:
+                system_prompt = self._prompt(message, grounding)
+                # Identical questions over identical data and conversation reuse the previous answer
+                return llm_response_cache.get_or_generate(
+                    intent, self.model_name, message, grounding,
+                    lambda: self.model.generate_content(system_prompt).text
+                )
             except Exception as e:
                 logging.error(f"Gemini error: {e}")
                 return self._fallback_response(message, stock_data)
         
+        def stream_response(self, message: str, stock_data: dict = None, intent: str = OPEN_INTENT,
+                            history: list = None):
+            """Yield the answer in chunks as Gemini generates them"""
+            if not self.available:
+                yield self._fallback_response(message, stock_data)
+                return
+            
+            grounding = self._grounding(message, stock_data, history)
+            system_prompt = self._prompt(message, grounding)
+            sent = False
+            try:
+                for chunk in llm_response_cache.stream_or_generate(
+                    intent, self.model_name, message, grounding,
+                    lambda: (part.text for part in self.model.generate_content(system_prompt, stream=True))
+                ):
+                    sent = True
+                    yield chunk
+            except Exception as e:
+                logging.error(f"Gemini error: {e}")
+                # Once text has gone out a fallback would be appended to it, so let the stream report the failure
+                if sent:
+                    raise
+                yield self._fallback_response(message, stock_data)
+        
         def _format_data(self, data: dict) -> str:
+            if data and 'comparison' in data:
+                return '\n'.join(self._format_data(item) for item in data['comparison'])
             if not data or 'error' in data:
                 return "No valid stock data"
             return f"Symbol: {data.get('symbol')}, Price: ₹{data.get('current_price')}, High: ₹{data.get('high')}, Low: ₹{data.get('low')}, Volume: {data.get('volume')}"
         
-        def _fallback_response(self, message: str, stock_data: dict = None) -> str:
-            words = set(re.findall(r'\b\w+\b', message.lower()))
-            
-            if stock_data and 'error' not in stock_data:
-                return f"📊 **{stock_data.get('symbol')} Live Data**\n\n**Price:** ₹{stock_data.get('current_price')}\n**High:** ₹{stock_data.get('high')}\n**Low:** ₹{stock_data.get('low')}\n**Volume:** {stock_data.get('volume')}"
-            
-            if any(w in words for w in ['hi', 'hello', 'hey']):
-                return "Hello! I'm Saytrix AI, your financial assistant. Ask me about stocks, portfolio management, or market insights!"
-            
-            if 'portfolio' in words:
-                return "💼 Use the Portfolio Calculator in the sidebar to manage your investments and calculate P&L."
-            
-            if any(w in words for w in ['market', 'nifty', 'sensex']):
-                return "📈 Check the live market widgets in the sidebar for current market data and trends."
-            
-            if any(w in words for w in ['stock', 'share', 'price']):
-                return "📊 I can help you get stock prices! Try asking about specific stocks or use the sidebar tools!"
-            
-            return f"I can help with stock analysis, portfolio management, and market insights. Try asking about specific stocks or use the sidebar tools!"
+        @staticmethod
+        def _format_history(message: str, history: list = None) -> str:
+            turns = list(history or [])
+            # The user message is saved in the background, so the read may already include it
+            if turns and turns[-1]['role'] == 'user' and turns[-1]['parts'] == [message]:
+                turns.pop()
+            return '\n'.join(
+                f"{'User' if turn['role'] == 'user' else 'Saytrix'}: {' '.join(turn['parts'])[:HISTORY_TURN_CHARS]}"
+                for turn in turns[-HISTORY_TURNS:]
+            )
+        
+        _fallback_response = staticmethod(fallback_response)
 
     gemini_chat = EnhancedGeminiChat()
     
@@ -175,6 +249,35 @@ user_mode_manager = UserModeManager()
 # Track user activity for auto-reset
 user_last_activity = {}
 
+def chat_stages(message, user_id, conversation_id, answer):
+    """Stage graph shared by /chat and /chat/stream; answer(results) builds the reply"""
+    def grounding(results):
+        intent, symbols = results['route']
+        # Deterministic intents are answered from templates without calling the LLM
+        if intent != OPEN_INTENT:
+            return None, template_response(intent, message, symbols, user_id)
+        return chat_grounding(message, symbols, user_id)
+    
+    def history(results):
+        if results['route'][0] != OPEN_INTENT:
+            return []
+        return db.get_conversation_history(user_id, conversation_id, limit=10)
+    
+    return [
+        Stage('route', lambda results: intent_router.route(message)),
+        Stage('save_user', lambda results: db.save_message(user_id, conversation_id, 'user', message), background=True),
+        # History load and quote fetch overlap
+        Stage('history', history, after=['route']),
+        Stage('grounding', grounding, after=['route']),
+        Stage('answer', answer, after=['history', 'grounding'])
+    ]
+
+def uses_llm(intent):
+    llm_available = bool(gemini_chat and gemini_chat.available)
+    used_llm = intent == OPEN_INTENT and llm_available
+    intent_router.record_answer(used_llm=used_llm, llm_available=llm_available)
+    return used_llm
+
 @app.route('/chat', methods=['POST'])
 @require_auth
 def chat():
@@ -186,95 +289,88 @@ def chat():
     if not message:
         return jsonify({'error': 'Message is required'}), 400
     
-    try:
-        stock_keywords = {
-            'zomato': 'ZOMATO.NS', 'reliance': 'RELIANCE.NS', 'tcs': 'TCS.NS',
-            'hdfc': 'HDFCBANK.NS', 'hdfcbank': 'HDFCBANK.NS', 'infosys': 'INFY.NS', 
-            'infy': 'INFY.NS', 'apple': 'AAPL', 'microsoft': 'MSFT', 'tesla': 'TSLA'
-        }
-        
-        message_lower = message.lower()
-        symbols = []
-        
-        words = set(re.findall(r'\b\w+\b', message_lower))
-        
-        # Find all matching stock symbols
-        for keyword, stock_symbol in stock_keywords.items():
-            if keyword in words:
-                symbols.append(stock_symbol)
-        
-        # If multiple symbols found, compare them
-        if len(symbols) > 1:
-            comparison_data = []
-            for symbol in symbols:
-                stock_data = execute_function('get_stock_price', {'symbol': symbol})
-                if stock_data and 'error' not in stock_data:
-                    comparison_data.append(stock_data)
-            
-            if comparison_data:
-                comparison_text = "📊 **Stock Comparison**\n\n"
-                for data in comparison_data:
-                    comparison_text += f"**{data['symbol']}**: ₹{data['current_price']} (H: ₹{data['high']}, L: ₹{data['low']})\n"
-                
-                try:
-                    if gemini_chat and gemini_chat.available:
-                        response_text = gemini_chat.get_response(message, {'comparison': comparison_data})
-                    else:
-                        response_text = comparison_text
-                except:
-                    response_text = comparison_text
-                
-                db.save_message(user_id, conversation_id, 'ai', response_text)
-                return jsonify({
-                    'response': response_text,
-                    'conversation_id': conversation_id,
-                    'timestamp': datetime.now().isoformat(),
-                    'user_id': user_id
-                })
-        
-        # Single symbol handling
-        symbol = symbols[0] if symbols else None
-        
-        conversation_history = db.get_conversation_history(user_id, conversation_id, limit=10)
-        
-        db.save_message(user_id, conversation_id, 'user', message)
-        
-        stock_data = None
-        if symbol:
-            stock_data = execute_function('get_stock_price', {'symbol': symbol})
-            # Log successful API call
-            if stock_data and 'error' not in stock_data:
-                cost_monitor.log_api_usage(user_id, 'alpha_vantage', f'/stock/{symbol}', success=True)
-            elif symbol:
-                cost_monitor.log_api_usage(user_id, 'alpha_vantage', f'/stock/{symbol}', success=False)
-        
+    def answer(results):
+        intent, _ = results['route']
+        stock_data, template_text = results['grounding']
+        if not uses_llm(intent):
+            return template_text
         try:
-            if gemini_chat and gemini_chat.available:
-                response_text = gemini_chat.get_response(message, stock_data)
-            else:
-                response_text = gemini_chat._fallback_response(message, stock_data)
+            return gemini_chat.get_response(message, stock_data, intent, results['history'])
         except Exception as e:
             logger.error(f"Gemini API error: {e}")
-            response_text = gemini_chat._fallback_response(message, stock_data)
-        
-        db.save_message(user_id, conversation_id, 'ai', response_text)
-        
-        # Cost monitoring is now handled above
+            return template_text
+    
+    try:
+        stages = chat_stages(message, user_id, conversation_id, answer) + [
+            Stage('save_ai', lambda results: db.save_message(user_id, conversation_id, 'ai', results['answer']),
+                  after=['answer'], background=True)
+        ]
+        results, timings = chat_pipeline.run(stages)
         
-        return jsonify({
-            'response': response_text,
+        payload = {
+            'response': results['answer'],
             'conversation_id': conversation_id,
             'timestamp': datetime.now().isoformat(),
-            'user_id': user_id
-        })
+            'user_id': user_id,
+            'intent': results['route'][0]
+        }
+        if app.debug:
+            payload['timings'] = timings
+        return jsonify(payload)
         
     except Exception as e:
         logger.error(f"Chat error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+@require_auth
+def chat_stream_response():
+    started = time.perf_counter()
+    data = request.get_json(force=True)
+    message = data.get('message', '')
+    user_id = request.user_id
+    conversation_id = data.get('conversation_id') or str(uuid.uuid4())
+    
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    def answer(results):
+        intent, _ = results['route']
+        stock_data, template_text = results['grounding']
+        # A generator: Gemini is only called once the response starts streaming
+        if not uses_llm(intent):
+            return [template_text]
+        return gemini_chat.stream_response(message, stock_data, intent, results['history'])
+    
+    try:
+        results, timings = chat_pipeline.run(chat_stages(message, user_id, conversation_id, answer), label='chat stream')
+    except Exception as e:
+        logger.error(f"Chat error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+    
+    meta = {
+        'conversation_id': conversation_id,
+        'timestamp': datetime.now().isoformat(),
+        'user_id': user_id,
+        'intent': results['route'][0]
+    }
+    if app.debug:
+        meta['timings'] = timings
+    save = lambda text: chat_pipeline.submit_background(
+        'save_ai', lambda: db.save_message(user_id, conversation_id, 'ai', text)
+    )
+    return Response(
+        stream_with_context(chat_stream.events(meta, results['answer'], save, started)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 def detect_stock_symbol(message):
     message_upper = message.upper().strip()
-    message_lower = message.lower().strip()
+    
+    listed = symbol_master.lookup(message)
+    if listed:
+        return listed
     
     import re
     if re.match(r'^[A-Z]{2,10}(\.NS|\.BO)?$', message_upper):
@@ -282,15 +378,6 @@ def detect_stock_symbol(message):
             return message_upper + '.NS'
         return message_upper
     
-    stock_keywords = {
-        'zomato': 'ZOMATO.NS', 'reliance': 'RELIANCE.NS', 'tcs': 'TCS.NS',
-        'hdfc': 'HDFCBANK.NS', 'infosys': 'INFY.NS', 'apple': 'AAPL',
-        'microsoft': 'MSFT', 'tesla': 'TSLA'
-    }
-    
-    if message_lower in stock_keywords:
-        return stock_keywords[message_lower]
-    
     return message_upper if len(message_upper) >= 2 and len(message_upper) <= 10 else None
 
 def format_stock_response(stock_data):
@@ -299,6 +386,60 @@ def format_stock_response(stock_data):
     
     return f"📊 **{stock_data.get('symbol')} Live Data**\n\n**Price:** ₹{stock_data.get('current_price')}\n**High:** ₹{stock_data.get('high')}\n**Low:** ₹{stock_data.get('low')}\n**Volume:** {stock_data.get('volume')}"
 
+def format_comparison_response(prices):
+    comparison_data = [data for data in prices.get('quotes', {}).values() if 'error' not in data]
+    if not comparison_data:
+        return "Unable to fetch stock data. Please try again."
+    
+    comparison_text = "📊 **Stock Comparison**\n\n"
+    for data in comparison_data:
+        comparison_text += f"**{data['symbol']}**: ₹{data['current_price']} (H: ₹{data['high']}, L: ₹{data['low']})\n"
+    if prices.get('timed_out'):
+        comparison_text += f"\n_Data not available (timed out): {', '.join(prices['timed_out'])}_\n"
+    return comparison_text
+
+def format_news_response(news_data):
+    if not news_data or 'error' in news_data or not news_data.get('news'):
+        return "📰 No news available right now. Check the News widget for the latest updates."
+    
+    news_text = f"📰 **Latest News: {news_data.get('symbol') or 'market'}**\n\n"
+    for item in news_data['news']:
+        source = f" _({item['source']})_" if item.get('source') else ""
+        news_text += f"• {item.get('title')}{source}\n"
+    return news_text
+
+def fetch_stock_data(user_id, symbol):
+    stock_data = execute_function('get_stock_price', {'symbol': symbol})
+    # Usage logging is bookkeeping, so it stays off the request's critical path
+    success = bool(stock_data and 'error' not in stock_data)
+    chat_pipeline.submit_background(
+        'log_api_usage', lambda: cost_monitor.log_api_usage(user_id, 'alpha_vantage', f'/stock/{symbol}', success=success)
+    )
+    return stock_data
+
+def chat_grounding(message, symbols, user_id):
+    """Data for an open question and the template answer to give without the LLM"""
+    # If multiple symbols found, compare them
+    if len(symbols) > 1:
+        prices = execute_function('get_stock_prices', {'symbols': symbols})
+        comparison_data = [data for data in prices.get('quotes', {}).values() if 'error' not in data]
+        if comparison_data:
+            return {'comparison': comparison_data}, format_comparison_response(prices)
+    
+    # Single symbol handling
+    stock_data = fetch_stock_data(user_id, symbols[0]) if symbols else None
+    return stock_data, fallback_response(message, stock_data)
+
+def template_response(intent, message, symbols, user_id):
+    """Answer a deterministic intent from the same templates the fallback path uses"""
+    if intent == 'price':
+        return format_stock_response(fetch_stock_data(user_id, symbols[0]))
+    if intent == 'comparison':
+        return format_comparison_response(execute_function('get_stock_prices', {'symbols': symbols}))
+    if intent == 'news':
+        return format_news_response(execute_function('get_market_news', {'symbol': symbols[0] if symbols else None}))
+    return fallback_response(message)
+
 def has_recent_activity(user_id):
     from datetime import datetime, timedelta
     last_activity = user_last_activity.get(user_id)
@@ -338,21 +479,23 @@ def quick_action():
 
 @app.route('/market-data', methods=['GET'])
 def market_data():
-    try:
-        symbols = ["NIFTY", "SENSEX", "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS"]
-        market_data_list = []
-        for symbol in symbols:
-            context = get_stock_context(symbol)
-            if "error" not in context:
-                market_data_list.append({
-                    "symbol": symbol,
-                    "name": symbol.replace(".NS", ""),
-                    "price": f"{context['current_price']:,}",
-                    "change": context['price_change']
-                })
-        return jsonify({"market_data": market_data_list})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    payload = market_snapshot.payload()
+    if payload is None:
+        return jsonify({"error": "Market data not available"}), 503
+    return Response(payload, mimetype='application/json')
+
+@app.route('/market-stream', methods=['GET'])
+def market_stream():
+    symbols = parse_symbols(request.args.get('symbols')) or MARKET_SYMBOLS
+    events = quote_stream.subscribe(symbols)
+    if events is None:
+        # This worker's stream slots are taken; the client falls back to polling /market-data
+        return jsonify({"error": "Live stream unavailable, poll /market-data"}), 503, {'Retry-After': '60'}
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/stock-analysis', methods=['POST'])
 def stock_analysis():
@@ -368,6 +511,40 @@ def portfolio_calculate():
     result = execute_function('calculate_portfolio_value', {'holdings': holdings})
     return jsonify(result)
 
+@app.route('/portfolio', methods=['GET'])
+@require_auth
+def get_saved_portfolio():
+    result = portfolio_snapshots.valuation(request.user_id)
+    if 'error' in result:
+        return jsonify(result), 404
+    return jsonify(result)
+
+@app.route('/portfolio', methods=['PUT'])
+@require_auth
+def save_portfolio():
+    holdings = (request.json or {}).get('holdings', [])
+    error = validate_holdings(holdings)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(portfolio_snapshots.save(request.user_id, holdings))
+
+@app.route('/portfolio-risk', methods=['POST'])
+def portfolio_risk():
+    data = request.json
+    result = execute_function('analyze_portfolio_risk', {
+        'holdings': data.get('holdings', []),
+        'period': data.get('period', '1y'),
+        'confidence': data.get('confidence', 0.95),
+        'include_matrices': bool(data.get('include_matrices', False))
+    })
+    if result.get('pending'):
+        # Still computing on the analytics pool; the client repeats the same request
+        response = jsonify(result)
+        response.status_code = 202
+        response.headers['Retry-After'] = str(result['retry_after_seconds'])
+        return response
+    return jsonify(result)
+
 @app.route('/clear-mode', methods=['POST'])
 @require_auth
 def clear_mode():
@@ -383,5 +560,33 @@ def get_user_usage():
     usage = cost_monitor.get_user_usage(request.user_id, days)
     return jsonify(usage)
 
+@app.route('/analytics/performance', methods=['GET'])
+@require_auth
+def get_performance_stats():
+    return jsonify({
+        'cache': api_cache.stats(),
+        'negative_cache': negative_cache.stats(),
+        'coalescing': request_coalescer.stats(),
+        'providers': http_client_stats(),
+        'quote_routing': quote_router.stats(),
+        'alpha_vantage_quota': alpha_vantage_quota.stats(),
+        'history_store': history_store.stats(),
+        'symbol_master': symbol_master.stats(),
+        'intent_routing': intent_router.stats(),
+        'llm_response_cache': llm_response_cache.stats(),
+        'chat_stream': chat_stream.stats(),
+        'chat_pipeline': chat_pipeline.stats(),
+        'indicators': indicator_engine.stats(),
+        'fanout': upstream_executor.stats(),
+        'analytics_pool': analytics_executor.stats(),
+        'refresh_pool': refresh_executor.stats(),
+        'fundamentals_pool': fundamentals_executor.stats(),
+        'portfolio_snapshots': portfolio_snapshots.stats(),
+        'market_snapshot': market_snapshot.stats(),
+        'quote_stream': quote_stream.stats(),
+        'pid': os.getpid(),
+        'generated_at': datetime.now().isoformat()
+    })
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
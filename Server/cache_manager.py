@@ -1,45 +1,272 @@
 import time
-from typing import Dict, Any, Optional
+import os
+import sys
 import json
-import hashlib
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+def freeze(value: Any) -> Any:
+    """Turn parameter values into hashable equivalents"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def _estimate_size(value: Any) -> int:
+    """Approximate memory footprint of cached data in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(v) for v in value)
+    return size
+
+def _json_value(value: Any) -> Any:
+    """json.dumps hook: numpy scalars and arrays become their Python values, anything else fails"""
+    if hasattr(value, 'tolist') and hasattr(value, 'dtype'):
+        return value.tolist()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
 
 class APICache:
-    def __init__(self, default_ttl: int = 60):
-        self.cache: Dict[str, Dict[str, Any]] = {}
+    """Bounded LRU cache with per-entry TTL and a byte budget"""
+
+    def __init__(self, default_ttl: int = 60, max_entries: int = 2048,
+                 max_bytes: int = 32 * 1024 * 1024, purge_interval: int = 30):
+        self.cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
         self.default_ttl = default_ttl
-    
-    def _generate_key(self, endpoint: str, params: Dict) -> str:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.purge_interval = purge_interval
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._last_purge = time.time()
+        self._lock = threading.RLock()
+
+    def _generate_key(self, endpoint: str, params: Dict) -> Tuple:
         """Generate cache key from endpoint and parameters"""
-        key_data = f"{endpoint}:{json.dumps(params, sort_keys=True)}"
-        return hashlib.md5(key_data.encode()).hexdigest()
-    
+        return (endpoint, freeze(params))
+
+    def _remove(self, key: Tuple) -> None:
+        entry = self.cache.pop(key)
+        self.current_bytes -= entry['size']
+
+    def _lookup(self, endpoint: str, params: Dict) -> Optional[Dict[str, Any]]:
+        key = self._generate_key(endpoint, params)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() >= entry['expires']:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return entry
+
     def get(self, endpoint: str, params: Dict) -> Optional[Any]:
         """Get cached data if valid"""
-        key = self._generate_key(endpoint, params)
-        if key in self.cache:
-            entry = self.cache[key]
-            if time.time() < entry['expires']:
-                return entry['data']
-            else:
-                del self.cache[key]
-        return None
-    
+        entry = self._lookup(endpoint, params)
+        return entry['data'] if entry else None
+
+    def get_with_age(self, endpoint: str, params: Dict) -> Optional[Tuple[Any, float]]:
+        """Get cached data together with its age in seconds"""
+        entry = self._lookup(endpoint, params)
+        return (entry['data'], time.time() - entry['timestamp']) if entry else None
+
     def set(self, endpoint: str, params: Dict, data: Any, ttl: Optional[int] = None) -> None:
-        """Cache data with TTL"""
+        """Cache data with TTL, evicting least recently used entries when over budget"""
         key = self._generate_key(endpoint, params)
-        expires = time.time() + (ttl or self.default_ttl)
-        self.cache[key] = {
-            'data': data,
-            'expires': expires,
-            'timestamp': time.time()
-        }
-    
+        now = time.time()
+        size = _estimate_size(data)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+            self.cache[key] = {
+                'data': data,
+                'expires': now + (ttl or self.default_ttl),
+                'timestamp': now,
+                'size': size
+            }
+            self.current_bytes += size
+
+            if len(self.cache) > self.max_entries or self.current_bytes > self.max_bytes:
+                # Reclaim expired entries first, at most once per purge interval
+                if now - self._last_purge >= self.purge_interval:
+                    self.clear_expired()
+                while len(self.cache) > self.max_entries or self.current_bytes > self.max_bytes:
+                    self._remove(next(iter(self.cache)))
+                    self.evictions += 1
+
     def clear_expired(self) -> None:
         """Remove expired entries"""
-        current_time = time.time()
-        expired_keys = [k for k, v in self.cache.items() if current_time >= v['expires']]
-        for key in expired_keys:
-            del self.cache[key]
+        with self._lock:
+            current_time = time.time()
+            expired_keys = [k for k, v in self.cache.items() if current_time >= v['expires']]
+            for key in expired_keys:
+                self._remove(key)
+            self.expirations += len(expired_keys)
+            self._last_purge = current_time
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self.cache.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'entries': len(self.cache),
+                'max_entries': self.max_entries,
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0
+            }
+
+class SharedAPICache:
+    """APICache-compatible cache stored in a local SQLite file shared by all worker processes"""
+
+    def __init__(self, path: str, default_ttl: int = 60, max_entries: int = 2048,
+                 max_bytes: int = 32 * 1024 * 1024, evict_every: int = 64):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sets = 0
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are opened lazily per process and thread, so a cache
+        # created before gunicorn forks (preload_app) never shares a handle
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, data TEXT, expires REAL, timestamp REAL, size INTEGER)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _generate_key(self, endpoint: str, params: Dict) -> str:
+        """Generate cache key from endpoint and parameters"""
+        return repr((endpoint, freeze(params)))
+
+    def _lookup(self, endpoint: str, params: Dict) -> Optional[Tuple[Any, float]]:
+        row = self._connection().execute(
+            "SELECT data, timestamp FROM cache WHERE key = ? AND expires > ?",
+            (self._generate_key(endpoint, params), time.time())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def get(self, endpoint: str, params: Dict) -> Optional[Any]:
+        """Get cached data if valid"""
+        entry = self._lookup(endpoint, params)
+        return entry[0] if entry else None
+
+    def get_with_age(self, endpoint: str, params: Dict) -> Optional[Tuple[Any, float]]:
+        """Get cached data together with its age in seconds"""
+        entry = self._lookup(endpoint, params)
+        return (entry[0], time.time() - entry[1]) if entry else None
+
+    def set(self, endpoint: str, params: Dict, data: Any, ttl: Optional[int] = None) -> None:
+        """Cache data with TTL; raises TypeError for values JSON cannot hold"""
+        payload = json.dumps(data, default=_json_value)
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, data, expires, timestamp, size) VALUES (?, ?, ?, ?, ?)",
+            (self._generate_key(endpoint, params), payload, now + (ttl or self.default_ttl), now, len(payload))
+        )
+        self._sets += 1
+        if self._sets % self.evict_every == 0:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the entries closest to expiry until within budget"""
+        conn = self._connection()
+        self.clear_expired()
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Remove enough rows to get back under both limits, plus 10% headroom
+        excess = max(count - self.max_entries, 0)
+        if total > self.max_bytes:
+            excess = max(excess, int(count * (total - self.max_bytes) / total) + 1)
+        excess += self.max_entries // 10
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += excess
+
+    def clear_expired(self) -> None:
+        """Remove expired entries"""
+        self._connection().execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._connection().execute("DELETE FROM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache size and this process's hit/miss/eviction counters"""
+        count, total = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'entries': count,
+            'max_entries': self.max_entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0
+        }
+
+def create_cache(default_ttl: int = 60):
+    """Build the cache selected by CACHE_BACKEND ('memory' or 'sqlite')"""
+    max_entries = int(os.getenv('CACHE_MAX_ENTRIES', 2048))
+    max_bytes = int(os.getenv('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    if os.getenv('CACHE_BACKEND', 'memory').lower() == 'sqlite':
+        path = os.getenv('CACHE_PATH', os.path.join(tempfile.gettempdir(), 'saytrix_cache.sqlite3'))
+        return SharedAPICache(path, default_ttl=default_ttl, max_entries=max_entries, max_bytes=max_bytes)
+    return APICache(default_ttl=default_ttl, max_entries=max_entries, max_bytes=max_bytes)
 
 # Global cache instance
-api_cache = APICache(default_ttl=60)
\ No newline at end of file
+api_cache = create_cache(default_ttl=60)
@@ -0,0 +1,129 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, Any, Callable, Iterable, List, Tuple
+from parallel_executor import ParallelExecutor, chat_executor, bookkeeping_executor
+
+logger = logging.getLogger(__name__)
+
+class Stage:
+    """One step of a request: run(results) gets the results of the stages it runs after"""
+
+    def __init__(self, name: str, run: Callable[[Dict[str, Any]], Any], after: Iterable[str] = (),
+                 background: bool = False):
+        self.name = name
+        self.run = run
+        self.after = tuple(after)
+        self.background = background
+
+class ChatPipeline:
+    """Runs a small stage graph per chat request and keeps per-stage latency percentiles.
+
+    A stage starts as soon as the stages it runs after have finished, so
+    independent stages (history load, quote fetch) overlap. Background stages
+    such as bookkeeping writes go to a single-threaded executor and are not
+    waited for; they still run in the order they were submitted.
+    """
+
+    def __init__(self, executor: ParallelExecutor, bookkeeping: ParallelExecutor, window: int = 1000):
+        self.executor = executor
+        self.bookkeeping = bookkeeping
+        self.requests = 0
+        self.background_errors = 0
+        self._timings: Dict[str, Dict[str, deque]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def _record(self, label: str, name: str, seconds: float) -> None:
+        with self._lock:
+            stages = self._timings.setdefault(label, {})
+            stages.setdefault(name, deque(maxlen=self._window)).append(seconds)
+
+    def _timed(self, stage: Stage, results: Dict[str, Any]) -> Tuple[Any, float]:
+        start_time = time.perf_counter()
+        value = stage.run(results)
+        return value, time.perf_counter() - start_time
+
+    def _background(self, stage: Stage, results: Dict[str, Any]) -> None:
+        try:
+            _, elapsed = self._timed(stage, results)
+            self._record('bookkeeping', stage.name, elapsed)
+        except Exception as e:
+            with self._lock:
+                self.background_errors += 1
+            logger.error(f"Background stage {stage.name} failed: {e}")
+
+    def submit_background(self, name: str, run: Callable[[], Any]) -> None:
+        """Queue a bookkeeping write outside a graph run"""
+        stage = Stage(name, lambda results: run(), background=True)
+        self.bookkeeping.submit(lambda: self._background(stage, {}))
+
+    def run(self, stages: List[Stage], label: str = 'chat') -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Run the stages and return their results and the critical-path timings in ms"""
+        started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        pending = list(stages)
+        running = {}
+
+        while pending or running:
+            ready = [stage for stage in pending if all(name in results for name in stage.after)]
+            for stage in ready:
+                pending.remove(stage)
+            critical = [stage for stage in ready if not stage.background]
+            for stage in ready:
+                if stage.background:
+                    snapshot = dict(results)
+                    self.bookkeeping.submit(lambda stage=stage, snapshot=snapshot: self._background(stage, snapshot))
+
+            # A lone ready stage runs on the request thread; parallel ones go to the pool
+            if len(critical) == 1 and not running:
+                stage = critical[0]
+                results[stage.name], elapsed = self._timed(stage, results)
+                timings[stage.name] = elapsed
+                continue
+            for stage in critical:
+                running[self.executor.submit(lambda stage=stage: self._timed(stage, results))] = stage
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Stages wait on unknown stages: {[s.name for s in pending]}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                results[stage.name], timings[stage.name] = future.result()
+
+        timings['total'] = time.perf_counter() - started
+        for name, seconds in timings.items():
+            self._record(label, name, seconds)
+        with self._lock:
+            self.requests += 1
+
+        timings_ms = {name: round(seconds * 1000, 2) for name, seconds in timings.items()}
+        logger.info(f"{label} stage timings (ms): " + ", ".join(f"{k}={v}" for k, v in timings_ms.items()))
+        return results, timings_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """Get p50/p99 latency per stage over the recent window, by pipeline label"""
+        with self._lock:
+            samples = {
+                label: {name: sorted(values) for name, values in stages.items()}
+                for label, stages in self._timings.items()
+            }
+            stats = {'requests': self.requests, 'background_errors': self.background_errors, 'stages': {}}
+        for label, stages in samples.items():
+            stats['stages'][label] = {
+                name: {
+                    'count': len(values),
+                    'p50_ms': round(values[int(0.50 * (len(values) - 1))] * 1000, 2),
+                    'p99_ms': round(values[int(0.99 * (len(values) - 1))] * 1000, 2)
+                }
+                for name, values in stages.items()
+            }
+        return stats
+
+# Global chat pipeline
+chat_pipeline = ChatPipeline(chat_executor, bookkeeping_executor)
@@ -0,0 +1,81 @@
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class ChatStream:
+    """Frames chat answers as Server-Sent Events and tracks time to first token.
+
+    The stream sends a meta event, one token event per chunk as the model
+    produces it, then a done event with timings. Whatever text was produced
+    is persisted when the generator closes, including after an error or a
+    client disconnect.
+    """
+
+    def __init__(self):
+        self.streams = 0
+        self.completed = 0
+        self.failed = 0
+        self.ttft_seconds = 0.0
+        self.max_ttft_seconds = 0.0
+        self.total_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def events(self, meta: Dict[str, Any], chunks: Iterable[str], on_complete: Callable[[str], None],
+               started: float) -> Iterator[str]:
+        """SSE events for the chunks; `started` is the perf_counter time the request arrived"""
+        parts = []
+        first_token = None
+        with self._lock:
+            self.streams += 1
+        try:
+            yield sse_event('meta', meta)
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(chunk)
+                yield sse_event('token', {'text': chunk})
+            total = time.perf_counter() - started
+            with self._lock:
+                self.completed += 1
+                self.ttft_seconds += first_token or total
+                self.max_ttft_seconds = max(self.max_ttft_seconds, first_token or total)
+                self.total_seconds += total
+            yield sse_event('done', {
+                'ttft_ms': round((first_token or total) * 1000, 1),
+                'total_ms': round(total * 1000, 1)
+            })
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            with self._lock:
+                self.failed += 1
+            yield sse_event('error', {'error': 'Response interrupted', 'partial': bool(parts)})
+        finally:
+            if parts:
+                try:
+                    on_complete(''.join(parts))
+                except Exception as e:
+                    logger.error(f"Failed to save streamed response: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get stream counts and average time to first token"""
+        with self._lock:
+            return {
+                'streams': self.streams,
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_ttft_ms': round(self.ttft_seconds / self.completed * 1000, 1) if self.completed else None,
+                'max_ttft_ms': round(self.max_ttft_seconds * 1000, 1),
+                'avg_total_ms': round(self.total_seconds / self.completed * 1000, 1) if self.completed else None
+            }
+
+# Global chat stream
+chat_stream = ChatStream()
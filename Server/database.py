@@ -71,16 +71,16 @@ class Database:
         self.conversations.insert_one(message_data)
     
     def get_conversation_history(self, user_id: str, conversation_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """Get conversation history for context"""
+        """Get the latest `limit` messages of a conversation, oldest first, for context"""
         messages = self.conversations.find({
             "user_id": user_id,
             "conversation_id": conversation_id
-        }).sort("timestamp", 1).limit(limit)
+        }).sort("timestamp", -1).limit(limit)
         
         return [{
             "role": "user" if msg["message_type"] == "user" else "model",
             "parts": [msg["content"]]
-        } for msg in messages]
+        } for msg in reversed(list(messages))]
     
     def get_user_conversations(self, user_id: str) -> List[Dict[str, Any]]:
         """Get list of user's conversations"""
@@ -123,6 +123,13 @@ class Database:
         """Get user's portfolio"""
         return self.portfolios.find_one({"user_id": user_id})
     
+    def save_portfolio_snapshot(self, user_id: str, snapshot: Dict[str, Any]) -> None:
+        """Save the latest P&L snapshot alongside the user's portfolio"""
+        self.portfolios.update_one(
+            {"user_id": user_id},
+            {"$set": {"snapshot": snapshot}}
+        )
+    
     # User Mode Management
     def save_user_mode(self, user_id: str, mode: str) -> None:
         """Save user's current mode"""
@@ -1,9 +1,22 @@
 import yfinance as yf
-import requests
-from typing import Dict, Any, List
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import os
-from cache_manager import api_cache
+import time
+import hashlib
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from cache_manager import api_cache, APICache, freeze
+from request_coalescer import request_coalescer
+from http_client import alpha_vantage_client, newsapi_client, yahoo_client
+from parallel_executor import ParallelExecutor, upstream_executor, analytics_executor, refresh_executor, fundamentals_executor
+from market_calendar import market_calendar
+from provider_router import Provider, ProviderRouter, ProviderSkipped
+from quota_governor import alpha_vantage_quota, QuotaExceededError
+from history_store import history_store, period_start, TIMESTAMP, OPEN, CLOSE, VOLUME
+from indicators import indicator_engine, INDICATORS
+from portfolio_analytics import align_closes, risk_metrics, correlated_pairs, value_lots
 from prompt_templates import ClosedWorldPrompts, validate_ai_response
 import logging
 
@@ -26,6 +39,21 @@ FUNCTION_SCHEMAS = [
             "required": ["symbol"]
         }
     },
+    {
+        "name": "get_stock_prices",
+        "description": "Get current prices for several stock symbols in one call",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "symbols": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of stock symbols (duplicates are ignored)"
+                }
+            },
+            "required": ["symbols"]
+        }
+    },
     {
         "name": "get_stock_history",
         "description": "Get historical stock price data for analysis",
@@ -40,11 +68,54 @@ FUNCTION_SCHEMAS = [
                     "type": "string",
                     "description": "Time period (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max)",
                     "enum": ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"]
+                },
+                "interval": {
+                    "type": "string",
+                    "description": "Bar size; intraday bars only reach back 60 days (730 for 1h)",
+                    "enum": ["1d", "1h", "15m", "5m"]
+                },
+                "format": {
+                    "type": "string",
+                    "description": "rows: the last 10 bars as objects; columnar: every bar in the period as dates/open/high/low/close/volume arrays",
+                    "enum": ["rows", "columnar"]
                 }
             },
             "required": ["symbol", "period"]
         }
     },
+    {
+        "name": "get_technical_indicators",
+        "description": "Get technical indicators (SMA, EMA, RSI, MACD, Bollinger Bands, ATR, VWAP) for one or more stocks",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "symbols": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of stock symbols"
+                },
+                "indicators": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": ["sma", "ema", "rsi", "macd", "bollinger", "atr", "vwap"]},
+                    "description": "Indicators to compute (default: all)"
+                },
+                "interval": {
+                    "type": "string",
+                    "description": "Bar size",
+                    "enum": ["1d", "1h", "15m", "5m"]
+                },
+                "params": {
+                    "type": "object",
+                    "description": "Per-indicator overrides, e.g. {\"rsi\": {\"period\": 9}, \"macd\": {\"fast\": 8}}"
+                },
+                "points": {
+                    "type": "integer",
+                    "description": "Number of most recent values to return per indicator (default 1)"
+                }
+            },
+            "required": ["symbols"]
+        }
+    },
     {
         "name": "compare_stocks",
         "description": "Compare multiple stocks side by side",
@@ -83,6 +154,41 @@ FUNCTION_SCHEMAS = [
             "required": ["holdings"]
         }
     },
+    {
+        "name": "analyze_portfolio_risk",
+        "description": "Analyze portfolio risk: volatility, beta against NIFTY, correlations, Value at Risk, max drawdown and concentration",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "holdings": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "symbol": {"type": "string"},
+                            "quantity": {"type": "number"}
+                        },
+                        "required": ["symbol", "quantity"]
+                    },
+                    "description": "List of portfolio holdings"
+                },
+                "period": {
+                    "type": "string",
+                    "description": "History window for the daily returns",
+                    "enum": ["3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"]
+                },
+                "confidence": {
+                    "type": "number",
+                    "description": "Value at Risk confidence level (default 0.95)"
+                },
+                "include_matrices": {
+                    "type": "boolean",
+                    "description": "Include the full covariance and correlation matrices"
+                }
+            },
+            "required": ["holdings"]
+        }
+    },
     {
         "name": "get_market_news",
         "description": "Get latest market news for a specific stock or general market",
@@ -98,57 +204,604 @@ FUNCTION_SCHEMAS = [
     }
 ]
 
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+YAHOO_CHART_URL = "https://query2.finance.yahoo.com/v8/finance/chart/{}"
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+
+# Yahoo Finance tickers for the index names used across the app
+YAHOO_SYMBOL_ALIASES = {
+    "NIFTY": "^NSEI",
+    "SENSEX": "^BSESN",
+    "BANKNIFTY": "^NSEBANK"
+}
+
+# Cache TTLs (seconds) for execute_function results
+FUNCTION_CACHE_TTLS = {
+    "get_stock_price": 30,
+    "get_stock_history": 15 * 60,
+    "get_market_news": 10 * 60
+}
+QUOTE_CACHE_TTL = FUNCTION_CACHE_TTLS["get_stock_price"]
+FUNDAMENTALS_CACHE_TTL = 6 * 60 * 60
+# Fraction of the fundamentals TTL after which a background refresh starts
+FUNDAMENTALS_REFRESH_AHEAD = 0.8
+# Most fundamentals refreshes queued at once; symbols past the cap retry on a later read
+FUNDAMENTALS_MAX_PENDING = int(os.getenv('FUNDAMENTALS_MAX_PENDING', 20))
+_fundamentals_slots = threading.BoundedSemaphore(FUNDAMENTALS_MAX_PENDING)
+# Functions whose TTL follows the market calendar
+QUOTE_FUNCTIONS = {"get_stock_price", "get_stock_context"}
+# How long past its TTL a session quote may be served while it is refreshed
+STALE_WHILE_REVALIDATE = int(os.getenv('STALE_WHILE_REVALIDATE', 5 * 60))
+
+# Symbols every provider answered for without data; kept apart so churn
+# through bad tickers cannot evict real quotes
+negative_cache = APICache(
+    default_ttl=int(os.getenv('NEGATIVE_CACHE_TTL', 5 * 60)),
+    max_entries=int(os.getenv('NEGATIVE_CACHE_MAX_ENTRIES', 10000)),
+    max_bytes=4 * 1024 * 1024
+)
+
+# Overall deadline (seconds) for multi-symbol fan-out, kept under gunicorn's worker timeout
+FANOUT_TIMEOUT = float(os.getenv('FANOUT_TIMEOUT', 8))
+# Share of the deadline the batched download may use before falling back per symbol
+BATCH_DEADLINE_SHARE = 0.6
+
+# Bar intervals the history store keeps, and how far back Yahoo serves each on first sync
+HISTORY_INTERVALS = ("1d", "1h", "15m", "5m")
+YAHOO_BACKFILL_PERIODS = {"1d": "max", "1h": "730d", "15m": "60d", "5m": "60d"}
+ALPHA_VANTAGE_COMPACT_DAYS = 100
+ALPHA_VANTAGE_BAR_FIELDS = ("1. open", "2. high", "3. low", "4. close", "5. volume")
+# Response shapes for history: recent rows for chat, full-period columns for charts
+HISTORY_FORMATS = ("rows", "columnar")
+HISTORY_ROWS = 10
+# Upper bound on the indicator values returned per output
+MAX_INDICATOR_POINTS = 500
+
+# Portfolio risk runs on the analytics pool; requests wait this long before getting a pending reply
+RISK_WAIT_SECONDS = float(os.getenv('RISK_WAIT_SECONDS', 5))
+RISK_DATA_TIMEOUT = float(os.getenv('RISK_DATA_TIMEOUT', 20))
+RISK_CACHE_TTL = 15 * 60
+RISK_BENCHMARK = "NIFTY"
+
+# Risk jobs running in this worker, by job id
+_risk_jobs: Dict[str, Future] = {}
+_risk_jobs_lock = threading.Lock()
+
+def _with_cache_info(data: Dict[str, Any], age: Optional[float] = None) -> Dict[str, Any]:
+    """Tag a result with whether it came from the cache and how old it is"""
+    return {**data, "cached": age is not None, "cache_age_seconds": round(age or 0, 1)}
+
+def _quote_ttl(symbol: str) -> float:
+    """Session TTL while the symbol's exchange trades, otherwise until it next opens"""
+    return market_calendar.quote_ttl(symbol, QUOTE_CACHE_TTL)
+
+def _cache_quote(function_name: str, symbol: str, data: Dict[str, Any]) -> None:
+    ttl = _quote_ttl(symbol)
+    if market_calendar.is_symbol_market_open(symbol):
+        # Kept past the TTL so it can be served stale while a refresh runs
+        ttl += STALE_WHILE_REVALIDATE
+    api_cache.set(function_name, {"symbol": symbol}, data, ttl=ttl)
+
+def _with_fundamentals(data: Dict[str, Any], symbol: str) -> Dict[str, Any]:
+    """Add the cached fundamentals to a Yahoo quote as it is served.
+
+    Fundamentals have their own cache and TTL, so they are never stored in
+    the quote itself; a placeholder from a cold cache would otherwise stay
+    in the cached quote until the next session open.
+    """
+    if data.get("source") != "Yahoo Finance":
+        return data
+    return {**data, **FunctionExecutor._cached_fundamentals(symbol)}
+
+def _lookup_quote(function_name: str, symbol: str) -> Optional[Dict[str, Any]]:
+    """Get a cached quote tagged with cache info, marking it stale past its TTL"""
+    cached = api_cache.get_with_age(function_name, {"symbol": symbol})
+    if cached is None:
+        return None
+    data, age = cached
+    result = _with_cache_info(_with_fundamentals(data, symbol), age)
+    if age > _quote_ttl(symbol):
+        result["stale"] = True
+    return result
+
+def _revalidate_in_background(function_name: str, params: Dict[str, Any], fetch,
+                              executor: ParallelExecutor = refresh_executor) -> Optional[Future]:
+    """Refresh a stale entry off the request thread, once per worker at a time.
+
+    Refreshes run on their own pool: a batch refresh blocks on upstream
+    fan-out, which would deadlock if it held upstream threads itself.
+    """
+    if not request_coalescer.is_in_flight(function_name, params):
+        def refresh():
+            with alpha_vantage_quota.policy(priority='background'):
+                return request_coalescer.do(function_name, params, fetch)
+        return executor.submit(refresh)
+    return None
+
+def _yahoo_reports_unknown(symbol: str) -> bool:
+    """Whether Yahoo's chart endpoint explicitly answers that it has no such symbol.
+
+    yfinance's history() returns the same empty frame for an unknown symbol
+    and for a request that failed, so an empty frame alone proves nothing.
+    """
+    try:
+        response = yahoo_client.get(
+            YAHOO_CHART_URL.format(YAHOO_SYMBOL_ALIASES.get(symbol, symbol)), params={"range": "1d", "interval": "1d"}
+        )
+        error = (response.json().get("chart") or {}).get("error") or {}
+    except Exception as e:
+        logger.error(f"Yahoo Finance symbol check failed for {symbol}: {e}")
+        return False
+    return error.get("code") == "Not Found"
+
+def _alpha_vantage_request(params: Dict[str, Any], routed: bool = False) -> Optional[Dict[str, Any]]:
+    """Call Alpha Vantage within the shared quota; None when the quota policy says to degrade.
+
+    Routed calls raise ProviderSkipped instead, so a quota denial does not
+    count as a provider failure.
+    """
+    if not alpha_vantage_quota.acquire():
+        if routed:
+            raise ProviderSkipped("alpha_vantage quota")
+        return None
+    data = alpha_vantage_client.get(ALPHA_VANTAGE_URL, params=params).json()
+    if "Note" in data or "Information" in data:
+        # Rate-limit notice rather than data
+        alpha_vantage_quota.record_upstream_limit()
+        return None
+    return data
+
+def _unknown_symbol_error(symbol: str) -> Optional[Dict[str, Any]]:
+    """Error result for a symbol recently confirmed unknown, if it is negatively cached"""
+    if negative_cache.get("unknown_symbol", {"symbol": symbol}) is None:
+        return None
+    return {"error": f"No data found for {symbol}", "symbol": symbol, "unknown_symbol": True}
+
+def _remember_unknown_symbol(symbol: str) -> None:
+    negative_cache.set("unknown_symbol", {"symbol": symbol}, True)
+
+def invalidate_unknown_symbols() -> None:
+    """Forget negatively cached symbols, e.g. after the symbol master changes"""
+    negative_cache.clear()
+
+def _unique_symbols(symbols: List[str]) -> List[str]:
+    """Drop empty and duplicate symbols while keeping request order"""
+    return list(dict.fromkeys(s.strip() for s in symbols if s and s.strip()))
+
+def _download_quotes(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch the latest daily bars for all symbols with one yfinance download"""
+    if not symbols:
+        return {}
+
+    tickers = {YAHOO_SYMBOL_ALIASES.get(s, s): s for s in symbols}
+    data = yf.download(
+        tickers=" ".join(tickers),
+        period="5d",
+        group_by="ticker",
+        progress=False,
+        threads=True
+    )
+    if data is None or data.empty:
+        return {}
+
+    quotes = {}
+    for ticker, symbol in tickers.items():
+        try:
+            frame = data[ticker] if data.columns.nlevels > 1 else data
+            frame = frame.dropna(subset=['Close'])
+            if frame.empty:
+                continue
+            last = frame.iloc[-1]
+            previous_close = frame['Close'].iloc[-2] if len(frame) > 1 else last['Open']
+            quotes[symbol] = {
+                "current_price": round(float(last['Close']), 2),
+                "high": round(float(last['High']), 2),
+                "low": round(float(last['Low']), 2),
+                "volume": int(last['Volume']),
+                "previous_close": round(float(previous_close), 2)
+            }
+        except Exception as e:
+            logger.error(f"Yahoo Finance batch parse error for {symbol}: {e}")
+    return quotes
+
+def _batch_quotes_before(symbols: List[str], deadline: float) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Run the batched Yahoo Finance download, leaving part of the deadline for fallbacks.
+
+    Returns None when the download failed or timed out, as opposed to an
+    empty dict when Yahoo answered without data for any symbol.
+    """
+    if not symbols:
+        return {}
+    results, timed_out = upstream_executor.run_all(
+        {"batch": lambda: _download_quotes(symbols)}, (deadline - time.time()) * BATCH_DEADLINE_SHARE
+    )
+    if timed_out:
+        logger.warning(f"Yahoo Finance batch timed out for {symbols}")
+        return None
+    batch = results["batch"]
+    if "error" in batch:
+        logger.error(f"Yahoo Finance batch error for {symbols}: {batch['error']}")
+        return None
+    return batch
+
+def _bars_from_frame(hist, interval: str) -> np.ndarray:
+    """Convert a yfinance history frame to the store's (6, n) column block"""
+    index = hist.index
+    if index.tz is not None:
+        # Daily bars keep the exchange's calendar date, intraday bars are stored in UTC
+        index = index.tz_localize(None) if interval == "1d" else index.tz_convert("UTC").tz_localize(None)
+    if interval == "1d":
+        index = index.normalize()
+    timestamps = index.values.astype("datetime64[s]").astype(np.float64)
+    values = hist[["Open", "High", "Low", "Close", "Volume"]].to_numpy(dtype=np.float64)
+    return np.vstack([timestamps, values.T])
+
+def _history_payload(bars: np.ndarray, interval: str, format: str = "rows") -> Dict[str, Any]:
+    """Build the history part of a response from a (6, n) bar block.
+
+    "rows" keeps the last HISTORY_ROWS bars as dicts; "columnar" returns
+    every bar in the period as parallel arrays for chart clients. Either
+    way the block is sliced before any conversion, and rounding and date
+    formatting run once per column rather than once per value.
+    """
+    if format == "rows":
+        bars = bars[:, -HISTORY_ROWS:]
+    dates = np.datetime_as_string(bars[TIMESTAMP].astype("datetime64[s]"), unit="D" if interval == "1d" else "m")
+    prices = np.round(bars[OPEN:VOLUME], 2)
+    columns = {
+        "dates": dates.tolist(),
+        "open": prices[0].tolist(),
+        "high": prices[1].tolist(),
+        "low": prices[2].tolist(),
+        "close": prices[3].tolist(),
+        "volume": bars[VOLUME].astype(np.int64).tolist()
+    }
+    if format == "columnar":
+        return {"columns": columns}
+    return {"history": [
+        {"date": date, "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for date, o, h, l, c, v in zip(*columns.values())
+    ]}
+
+def _alpha_vantage_bars(symbol: str, start: Optional[float]) -> Optional[np.ndarray]:
+    api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
+    if not api_key:
+        return None
+    # The compact series covers the last 100 sessions, enough for a tail update
+    compact = start is not None and time.time() - start < ALPHA_VANTAGE_COMPACT_DAYS * 86400
+    data = _alpha_vantage_request({
+        "function": "TIME_SERIES_DAILY", "symbol": symbol, "apikey": api_key,
+        "outputsize": "compact" if compact else "full"
+    }) or {}
+    series = data.get("Time Series (Daily)")
+    if not series:
+        return None
+    dates = sorted(series)
+    bars = np.array([
+        [np.datetime64(d, "s").astype(np.float64)] + [float(series[d][field]) for field in ALPHA_VANTAGE_BAR_FIELDS]
+        for d in dates
+    ]).T
+    return bars if start is None else bars[:, bars[0] >= start]
+
+def _yahoo_bars(symbol: str, start: Optional[float], interval: str) -> Optional[np.ndarray]:
+    ticker = yf.Ticker(YAHOO_SYMBOL_ALIASES.get(symbol, symbol))
+    if start is None:
+        hist = ticker.history(period=YAHOO_BACKFILL_PERIODS.get(interval, "max"), interval=interval)
+    else:
+        hist = ticker.history(start=np.datetime_as_string(np.datetime64(int(start), "s"), unit="D"), interval=interval)
+    if hist.empty:
+        # Nothing new since the last stored bar still counts as a successful sync
+        return None if start is None else np.empty((6, 0))
+    bars = _bars_from_frame(hist, interval)
+    return bars if start is None else bars[:, bars[0] >= start]
+
+def _fetch_history_bars(symbol: str, start: Optional[float], interval: str = "1d") -> Optional[Tuple[np.ndarray, str]]:
+    """Fetch bars at or after start for the history store, Alpha Vantage first for daily bars"""
+    if interval == "1d":
+        try:
+            bars = _alpha_vantage_bars(symbol, start)
+            if bars is not None:
+                return bars, "Alpha Vantage"
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"Alpha Vantage history error for {symbol}: {e}")
+    try:
+        bars = _yahoo_bars(symbol, start, interval)
+        if bars is not None:
+            return bars, "Yahoo Finance"
+    except Exception as e:
+        logger.error(f"Yahoo Finance history error for {symbol}: {e}")
+    return None
+
+def _stored_bars(symbol: str, interval: str = "1d") -> Optional[np.ndarray]:
+    """Sync a symbol's bars into the history store and return all of them"""
+    if not history_store.sync(symbol, lambda start: _fetch_history_bars(symbol, start, interval), interval):
+        return None
+    bars = history_store.load(symbol, interval)
+    return bars if bars is not None and bars.shape[1] else None
+
+def _date_string(timestamp: float) -> str:
+    return str(np.datetime_as_string(np.datetime64(int(timestamp), "s"), unit="D"))
+
+def _portfolio_risk(holdings: List[List[Any]], period: str, benchmark: str, confidence: float,
+                    include_matrices: bool) -> Dict[str, Any]:
+    """Load aligned daily closes for the holdings and benchmark and compute the risk report"""
+    start_time = time.time()
+    symbols = [symbol for symbol, _ in holdings]
+    quantities = np.array([quantity for _, quantity in holdings], dtype=np.float64)
+    
+    tasks = {symbol: (lambda symbol=symbol: _stored_bars(symbol)) for symbol in {*symbols, benchmark}}
+    loaded, timed_out = upstream_executor.run_all(tasks, RISK_DATA_TIMEOUT)
+    available = [i for i, symbol in enumerate(symbols) if isinstance(loaded.get(symbol), np.ndarray)]
+    missing = [symbol for symbol in symbols if not isinstance(loaded.get(symbol), np.ndarray)]
+    if not available:
+        return {"error": "No historical data found for any holding", "missing": missing}
+    benchmark_bars = loaded.get(benchmark) if isinstance(loaded.get(benchmark), np.ndarray) else None
+    
+    # The benchmark's sessions form the date grid; without it, every date any holding traded
+    series = [(loaded[symbols[i]][TIMESTAMP], loaded[symbols[i]][CLOSE]) for i in available]
+    grid = benchmark_bars[TIMESTAMP] if benchmark_bars is not None else np.unique(np.concatenate([t for t, _ in series]))
+    first = period_start(period)
+    if first is not None:
+        grid = grid[grid >= first]
+    closes = align_closes(grid, series)
+    complete = ~np.isnan(closes).any(axis=1)
+    closes, grid = closes[complete], grid[complete]
+    if len(grid) < 3:
+        return {"error": "Not enough overlapping history to measure risk", "missing": missing}
+    
+    returns = closes[1:] / closes[:-1] - 1
+    benchmark_returns = None
+    if benchmark_bars is not None:
+        benchmark_closes = align_closes(grid, [(benchmark_bars[TIMESTAMP], benchmark_bars[CLOSE])])[:, 0]
+        benchmark_returns = benchmark_closes[1:] / benchmark_closes[:-1] - 1
+    
+    values = quantities[available] * closes[-1]
+    total_value = float(values.sum())
+    weights = values / total_value
+    metrics = risk_metrics(weights, returns, benchmark_returns, confidence)
+    held = [symbols[i] for i in available]
+    
+    def percent_and_amount(fraction: float) -> Dict[str, float]:
+        return {"percent": round(fraction * 100, 2), "amount": round(fraction * total_value, 2)}
+    
+    report = {
+        "portfolio_value": round(total_value, 2),
+        "period": period,
+        "benchmark": benchmark if benchmark_returns is not None else None,
+        "confidence": confidence,
+        "observations": metrics["observations"],
+        "start_date": _date_string(grid[0]),
+        "end_date": _date_string(grid[-1]),
+        "volatility": {
+            "daily_percent": round(metrics["volatility_daily"] * 100, 3),
+            "annual_percent": round(metrics["volatility_annual"] * 100, 2)
+        },
+        "beta": round(metrics["beta"], 3) if "beta" in metrics else None,
+        "benchmark_correlation": round(metrics["benchmark_correlation"], 3) if "beta" in metrics else None,
+        "value_at_risk_1d": {
+            "historical": percent_and_amount(metrics["var_historical"]),
+            "parametric": percent_and_amount(metrics["var_parametric"]),
+            "expected_shortfall": percent_and_amount(metrics["cvar_historical"])
+        },
+        "max_drawdown": {
+            "percent": round(metrics["max_drawdown"] * 100, 2),
+            "peak_date": _date_string(grid[metrics["peak_index"]]),
+            "trough_date": _date_string(grid[metrics["trough_index"]])
+        },
+        "concentration": {
+            "herfindahl_index": round(metrics["concentration"]["herfindahl_index"], 4),
+            "effective_holdings": round(metrics["concentration"]["effective_holdings"], 2),
+            "top_holding": held[metrics["concentration"]["top_index"]],
+            "top_weight_percent": round(metrics["concentration"]["top_weight"] * 100, 2),
+            "top_5_weight_percent": round(metrics["concentration"]["top_5_weight"] * 100, 2)
+        },
+        "holdings": [
+            {"symbol": symbol, "weight_percent": weight, "volatility_annual_percent": volatility, "beta": beta}
+            for symbol, weight, volatility, beta in zip(
+                held,
+                np.round(weights * 100, 2).tolist(),
+                np.round(metrics["holding_volatility_annual"] * 100, 2).tolist(),
+                np.round(metrics["holding_betas"], 3).tolist() if "holding_betas" in metrics else [None] * len(held)
+            )
+        ],
+        "most_correlated": [
+            {"symbols": [held[a], held[b]], "correlation": round(value, 3)}
+            for a, b, value in correlated_pairs(metrics["correlation"])
+        ],
+        "missing": missing,
+        "timed_out": timed_out,
+        "computed_in_ms": round((time.time() - start_time) * 1000, 2),
+        "calculation_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    if include_matrices:
+        report["matrices"] = {
+            "symbols": held,
+            "covariance": np.round(metrics["covariance"], 8).tolist(),
+            "correlation": np.round(np.nan_to_num(metrics["correlation"]), 4).tolist()
+        }
+    return report
+
+def quote_price(quotes: Dict[str, Dict[str, Any]], symbol: str) -> Optional[float]:
+    quote = quotes.get(symbol.strip(), {"error": True})
+    return None if "error" in quote else quote["current_price"]
+
+def value_holdings(holdings: List[Dict], quotes: Dict[str, Dict[str, Any]],
+                   lot_numbers: Optional[List[int]] = None) -> Tuple[List[Dict], List[Dict], List[str]]:
+    """Per-lot rows, per-symbol rows and unpriced symbols for holdings valued at the given quotes.
+
+    lot_numbers gives each holding's position in the full portfolio when
+    only part of it is being revalued.
+    """
+    lot_numbers = lot_numbers if lot_numbers is not None else list(range(len(holdings)))
+    symbols = [h["symbol"].strip() for h in holdings]
+    quantities = np.array([h["quantity"] for h in holdings], dtype=np.float64)
+    avg_prices = np.array([h["avg_price"] for h in holdings], dtype=np.float64)
+    
+    unique_symbols, inverse = np.unique(symbols, return_inverse=True)
+    symbol_prices = np.array([
+        np.nan if quote_price(quotes, symbol) is None else quote_price(quotes, symbol)
+        for symbol in unique_symbols
+    ], dtype=np.float64)
+    values = value_lots(quantities, avg_prices, symbol_prices, inverse, len(unique_symbols))
+    
+    lots = np.flatnonzero(values["priced"])
+    lot_columns = zip(
+        lots.tolist(),
+        values["lot_price"][lots].tolist(),
+        np.round(values["lot_current"][lots], 2).tolist(),
+        np.round(values["lot_invested"][lots], 2).tolist(),
+        np.round(values["lot_pnl"][lots], 2).tolist(),
+        np.round(values["lot_pnl_percent"][lots], 2).tolist()
+    )
+    lot_rows = [{
+        "lot": lot_numbers[i],
+        "symbol": holdings[i]["symbol"],
+        "quantity": holdings[i]["quantity"],
+        "avg_price": holdings[i]["avg_price"],
+        "current_price": price,
+        "current_value": current,
+        "invested_value": invested,
+        "pnl": pnl,
+        "pnl_percent": pnl_percent
+    } for i, price, current, invested, pnl, pnl_percent in lot_columns]
+    
+    held = np.flatnonzero(values["symbol_lots"] > 0)
+    symbol_columns = zip(
+        unique_symbols[held].tolist(),
+        values["symbol_lots"][held].astype(int).tolist(),
+        values["symbol_quantity"][held].tolist(),
+        np.round(values["symbol_avg_price"][held], 2).tolist(),
+        symbol_prices[held].tolist(),
+        np.round(values["symbol_invested"][held], 2).tolist(),
+        np.round(values["symbol_current"][held], 2).tolist(),
+        np.round(values["symbol_pnl"][held], 2).tolist(),
+        np.round(values["symbol_pnl_percent"][held], 2).tolist()
+    )
+    symbol_rows = [{
+        "symbol": symbol,
+        "lots": lot_count,
+        "quantity": quantity,
+        "avg_price": avg_price,
+        "current_price": price,
+        "invested_value": invested,
+        "current_value": current,
+        "pnl": pnl,
+        "pnl_percent": pnl_percent
+    } for symbol, lot_count, quantity, avg_price, price, invested, current, pnl, pnl_percent in symbol_columns]
+    
+    return lot_rows, symbol_rows, unique_symbols[np.isnan(symbol_prices)].tolist()
+
+def portfolio_summary(symbol_rows: List[Dict], lot_count: int) -> Dict[str, Any]:
+    """Portfolio totals from per-symbol rows"""
+    total_invested = sum(row["invested_value"] for row in symbol_rows)
+    total_current_value = sum(row["current_value"] for row in symbol_rows)
+    total_pnl = total_current_value - total_invested
+    total_pnl_percent = (total_pnl / total_invested) * 100 if total_invested > 0 else 0
+    return {
+        "total_invested": round(total_invested, 2),
+        "total_current_value": round(total_current_value, 2),
+        "total_pnl": round(total_pnl, 2),
+        "total_pnl_percent": round(total_pnl_percent, 2),
+        "number_of_holdings": lot_count,
+        "number_of_symbols": len(symbol_rows)
+    }
+
 class FunctionExecutor:
     @staticmethod
-    def get_stock_price(symbol: str) -> Dict[str, Any]:
-        # Try yfinance first (more reliable)
+    def _yahoo_quote(symbol: str) -> Optional[Dict[str, Any]]:
+        # Fast path: one history call; fundamentals are added from their cache when served.
+        # None means the lookup failed; {} means Yahoo answered with no data
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            hist = ticker.history(period="1d")
+            hist = yf.Ticker(YAHOO_SYMBOL_ALIASES.get(symbol, symbol)).history(period="1d")
             
-            if not hist.empty and info:
-                current_price = hist['Close'].iloc[-1]
-                result = {
+            if hist.empty:
+                # Unknown only when Yahoo says so; otherwise the lookup failed
+                return {} if _yahoo_reports_unknown(symbol) else None
+            current_price = hist['Close'].iloc[-1]
+            return {
+                "symbol": symbol,
+                "current_price": round(current_price, 2),
+                "high": round(hist['High'].iloc[-1], 2),
+                "low": round(hist['Low'].iloc[-1], 2),
+                "volume": int(hist['Volume'].iloc[-1]),
+                "source": "Yahoo Finance",
+                "timestamp": datetime.now().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Yahoo Finance error for {symbol}: {e}")
+        return None
+    
+    @staticmethod
+    def _yahoo_fundamentals(symbol: str) -> Optional[Dict[str, Any]]:
+        # ticker.info is the slowest yfinance call, so it never runs on the request path
+        try:
+            info = yf.Ticker(YAHOO_SYMBOL_ALIASES.get(symbol, symbol)).info
+        except Exception as e:
+            logger.error(f"Yahoo Finance fundamentals error for {symbol}: {e}")
+            return None
+        if not info:
+            return None
+        fundamentals = {
+            "market_cap": info.get('marketCap', 'N/A'),
+            "pe_ratio": info.get('trailingPE', 'N/A')
+        }
+        api_cache.set("fundamentals", {"symbol": symbol}, fundamentals, ttl=FUNDAMENTALS_CACHE_TTL)
+        return fundamentals
+    
+    @staticmethod
+    def _cached_fundamentals(symbol: str) -> Dict[str, Any]:
+        """Cached fundamentals, refreshed in the background when missing or near expiry"""
+        cached = api_cache.get_with_age("fundamentals", {"symbol": symbol})
+        refresh_due = cached is None or cached[1] > FUNDAMENTALS_CACHE_TTL * FUNDAMENTALS_REFRESH_AHEAD
+        if refresh_due and _fundamentals_slots.acquire(blocking=False):
+            future = _revalidate_in_background(
+                "fundamentals", {"symbol": symbol},
+                lambda: FunctionExecutor._yahoo_fundamentals(symbol),
+                executor=fundamentals_executor
+            )
+            if future is None:
+                _fundamentals_slots.release()
+            else:
+                future.add_done_callback(lambda _: _fundamentals_slots.release())
+        if cached is None:
+            return {"market_cap": "N/A", "pe_ratio": "N/A"}
+        return cached[0]
+    
+    @staticmethod
+    def _alpha_vantage_quote(symbol: str) -> Optional[Dict[str, Any]]:
+        api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
+        if not api_key:
+            return None
+        try:
+            data = _alpha_vantage_request({"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": api_key}, routed=True)
+            if data is None:
+                return None
+            if "Error Message" in data or data.get("Global Quote") == {}:
+                # Alpha Vantage does not know the symbol
+                return {}
+            if "Global Quote" in data and data["Global Quote"]:
+                quote = data["Global Quote"]
+                return {
                     "symbol": symbol,
-                    "current_price": round(current_price, 2),
-                    "high": round(hist['High'].iloc[-1], 2),
-                    "low": round(hist['Low'].iloc[-1], 2),
-                    "volume": int(hist['Volume'].iloc[-1]),
-                    "market_cap": info.get('marketCap', 'N/A'),
-                    "pe_ratio": info.get('trailingPE', 'N/A'),
-                    "source": "Yahoo Finance",
+                    "current_price": float(quote.get("05. price", 0)),
+                    "change": float(quote.get("09. change", 0)),
+                    "change_percent": quote.get("10. change percent", "0%"),
+                    "high": float(quote.get("03. high", 0)),
+                    "low": float(quote.get("04. low", 0)),
+                    "volume": int(quote.get("06. volume", 0)),
+                    "source": "Alpha Vantage",
                     "timestamp": datetime.now().isoformat()
                 }
-                return result
+        except (QuotaExceededError, ProviderSkipped):
+            raise
         except Exception as e:
-            logger.error(f"Yahoo Finance error for {symbol}: {e}")
-        
-        # Try Alpha Vantage as fallback
-        api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
-        if api_key:
-            try:
-                url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={api_key}"
-                response = requests.get(url, timeout=10)
-                data = response.json()
-                
-                if "Global Quote" in data and data["Global Quote"]:
-                    quote = data["Global Quote"]
-                    result = {
-                        "symbol": symbol,
-                        "current_price": float(quote.get("05. price", 0)),
-                        "change": float(quote.get("09. change", 0)),
-                        "change_percent": quote.get("10. change percent", "0%"),
-                        "high": float(quote.get("03. high", 0)),
-                        "low": float(quote.get("04. low", 0)),
-                        "volume": int(quote.get("06. volume", 0)),
-                        "source": "Alpha Vantage",
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    return result
-            except Exception as e:
-                logger.error(f"Alpha Vantage API error for {symbol}: {e}")
-        
+            logger.error(f"Alpha Vantage API error for {symbol}: {e}")
+        return None
+    
+    @staticmethod
+    def _demo_quote(symbol: str) -> Optional[Dict[str, Any]]:
         # Return mock data for demo
         mock_data = {
             "ZOMATO.NS": {"current_price": 268.45, "high": 275.20, "low": 265.10, "volume": 12500000},
@@ -167,89 +820,225 @@ class FunctionExecutor:
                 "source": "Demo Data",
                 "timestamp": datetime.now().isoformat()
             }
+        return None
+    
+    @staticmethod
+    def get_stock_price(symbol: str) -> Dict[str, Any]:
+        if not symbol or not isinstance(symbol, str):
+            return {"error": "A stock symbol is required", "symbol": symbol}
+        unknown = _unknown_symbol_error(symbol)
+        if unknown:
+            return unknown
+        
+        # yfinance first (more reliable), hedged to Alpha Vantage when slow, then demo data
+        routed = quote_router.call(symbol)
+        result = routed or FunctionExecutor._demo_quote(symbol)
+        if result:
+            return result
         
+        # Only remember symbols that every configured provider answered for
+        if routed == {}:
+            _remember_unknown_symbol(symbol)
         return {"error": f"No data found for {symbol}", "symbol": symbol}
     
     @staticmethod
-    def get_stock_history(symbol: str, period: str) -> Dict[str, Any]:
-        # Try Alpha Vantage API first
-        api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
-        if api_key:
-            try:
-                url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={symbol}&apikey={api_key}"
-                response = requests.get(url, timeout=10)
-                data = response.json()
-                
-                if "Time Series (Daily)" in data:
-                    time_series = data["Time Series (Daily)"]
-                    history_data = []
-                    
-                    for date, values in list(time_series.items())[:30]:  # Last 30 days
-                        history_data.append({
-                            "date": date,
-                            "open": float(values["1. open"]),
-                            "high": float(values["2. high"]),
-                            "low": float(values["3. low"]),
-                            "close": float(values["4. close"]),
-                            "volume": int(values["5. volume"])
-                        })
-                    
-                    return {
-                        "symbol": symbol,
-                        "period": period,
-                        "data_points": len(history_data),
-                        "history": history_data[:10],
-                        "source": "Alpha Vantage"
-                    }
-            except:
-                pass
+    def _fallback_quote(symbol: str, yahoo_answered: bool = False) -> Dict[str, Any]:
+        alpha_vantage = quote_router.call(symbol, exclude=["yahoo"])
+        result = alpha_vantage or FunctionExecutor._demo_quote(symbol)
+        if result:
+            return result
+        
+        # The batch drops tickers whose own request failed, so Yahoo must also confirm it
+        if (yahoo_answered and (alpha_vantage == {} or not os.getenv('ALPHA_VANTAGE_API_KEY'))
+                and _yahoo_reports_unknown(symbol)):
+            _remember_unknown_symbol(symbol)
+        return {"error": f"No data found for {symbol}", "symbol": symbol}
+    
+    @staticmethod
+    def _fetch_quotes(symbols: List[str], deadline: float) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Fetch quotes upstream, batched first, then per-symbol fallbacks in parallel"""
+        results = {}
+        batch = _batch_quotes_before(symbols, deadline)
+        # An empty batch more likely means Yahoo is failing than that every symbol is unknown
+        yahoo_answered = bool(batch)
+        batch = batch or {}
+        for symbol, quote in batch.items():
+            change = quote["current_price"] - quote["previous_close"]
+            change_percent = (change / quote["previous_close"]) * 100 if quote["previous_close"] > 0 else 0
+            results[symbol] = {
+                "symbol": symbol,
+                "current_price": quote["current_price"],
+                "change": round(change, 2),
+                "change_percent": f"{change_percent:.2f}%",
+                "high": quote["high"],
+                "low": quote["low"],
+                "volume": quote["volume"],
+                "source": "Yahoo Finance",
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        # Symbols missing from the batch go through the remaining providers in parallel
+        fallbacks, timed_out = upstream_executor.run_all(
+            {
+                symbol: (lambda s=symbol: FunctionExecutor._fallback_quote(s, yahoo_answered))
+                for symbol in symbols if symbol not in batch
+            },
+            deadline - time.time()
+        )
+        results.update(fallbacks)
+        for symbol in timed_out:
+            results[symbol] = {"error": f"Timed out fetching {symbol}", "symbol": symbol, "timed_out": True}
+        
+        for symbol in symbols:
+            if "error" not in results[symbol]:
+                _cache_quote("get_stock_price", symbol, results[symbol])
+                results[symbol] = _with_cache_info(_with_fundamentals(results[symbol], symbol))
+        return results, timed_out
+    
+    @staticmethod
+    def get_stock_prices(symbols: List[str], timeout: float = FANOUT_TIMEOUT) -> Dict[str, Any]:
+        """Get current prices for several symbols with one batched upstream call"""
+        deadline = time.time() + timeout
+        unique_symbols = _unique_symbols(symbols)
+        
+        # Quotes are cached per symbol, so only the misses go upstream
+        results = {}
+        misses = []
+        for symbol in unique_symbols:
+            cached = _lookup_quote("get_stock_price", symbol) or _unknown_symbol_error(symbol)
+            if cached is not None:
+                results[symbol] = cached
+            else:
+                misses.append(symbol)
+        
+        stale = [symbol for symbol, data in results.items() if data.get("stale")]
+        if stale:
+            _revalidate_in_background(
+                "get_stock_prices", {"symbols": stale},
+                lambda: FunctionExecutor._fetch_quotes(stale, time.time() + FANOUT_TIMEOUT)
+            )
+        
+        fetched, timed_out = FunctionExecutor._fetch_quotes(misses, deadline)
+        results.update(fetched)
         
-        # Fallback to yfinance with multiple symbols
+        results = {symbol: results[symbol] for symbol in unique_symbols}
+        error_count = sum(1 for data in results.values() if "error" in data)
+        return {
+            "requested": len(symbols),
+            "unique_symbols": len(unique_symbols),
+            "success_count": len(results) - error_count,
+            "error_count": error_count,
+            "timed_out": timed_out,
+            "quotes": results,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def get_stock_history(symbol: str, period: str, interval: str = "1d", format: str = "rows") -> Dict[str, Any]:
+        if interval not in HISTORY_INTERVALS:
+            return {"error": f"Unsupported interval: {interval}"}
+        if format not in HISTORY_FORMATS:
+            return {"error": f"Unsupported format: {format}"}
+        try:
+            period_start(period)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        # Served from the local store; only bars newer than the last stored one are fetched
         symbols_to_try = [symbol, "HDFCBANK.NS", "RELIANCE.NS", "TCS.NS", "AAPL"]
         
         for sym in symbols_to_try:
             try:
-                ticker = yf.Ticker(sym)
-                hist = ticker.history(period=period)
+                if not history_store.sync(sym, lambda start: _fetch_history_bars(sym, start, interval), interval):
+                    continue
+                bars = history_store.slice(sym, period, interval)
+                if bars is None or not bars.shape[1]:
+                    continue
                 
-                if not hist.empty:
-                    history_data = [{
-                        "date": date.strftime("%Y-%m-%d"),
-                        "open": round(row['Open'], 2),
-                        "high": round(row['High'], 2),
-                        "low": round(row['Low'], 2),
-                        "close": round(row['Close'], 2),
-                        "volume": int(row['Volume'])
-                    } for date, row in hist.iterrows()]
-                    
-                    return {
-                        "symbol": sym,
-                        "period": period,
-                        "data_points": len(history_data),
-                        "history": history_data[-10:],
-                        "source": "Yahoo Finance"
-                    }
-            except:
+                return {
+                    "symbol": sym,
+                    "period": period,
+                    "interval": interval,
+                    "data_points": int(bars.shape[1]),
+                    **_history_payload(bars, interval, format),
+                    "source": history_store.meta(sym, interval).get("source")
+                }
+            except QuotaExceededError:
+                raise
+            except Exception as e:
+                logger.error(f"History error for {sym}: {e}")
                 continue
         
         return {"error": f"No historical data found for {symbol}"}
     
+    @staticmethod
+    def get_technical_indicators(symbols: List[str], indicators: Optional[List[str]] = None, interval: str = "1d",
+                                 params: Optional[Dict[str, Dict[str, Any]]] = None, points: int = 1,
+                                 timeout: float = FANOUT_TIMEOUT) -> Dict[str, Any]:
+        """Compute indicators for several symbols from the local history store"""
+        indicators = indicators or list(INDICATORS)
+        unknown = [name for name in indicators if name not in INDICATORS]
+        if unknown:
+            return {"error": f"Unknown indicators: {', '.join(unknown)}"}
+        if interval not in HISTORY_INTERVALS:
+            return {"error": f"Unsupported interval: {interval}"}
+        if not isinstance(points, int) or not 1 <= points <= MAX_INDICATOR_POINTS:
+            return {"error": f"points must be between 1 and {MAX_INDICATOR_POINTS}"}
+        try:
+            resolved = {name: indicator_engine.resolve_params(name, (params or {}).get(name)) for name in indicators}
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        unique_symbols = _unique_symbols(symbols)
+        results = {}
+        pending = {}
+        for symbol in unique_symbols:
+            unknown_error = _unknown_symbol_error(symbol)
+            if unknown_error:
+                results[symbol] = unknown_error
+            else:
+                pending[symbol] = lambda symbol=symbol: _stored_bars(symbol, interval)
+        
+        # Syncing bars is I/O bound, so symbols are fetched in parallel
+        loaded, timed_out = upstream_executor.run_all(pending, timeout)
+        for symbol, bars in loaded.items():
+            if bars is None or isinstance(bars, dict):
+                results[symbol] = {"error": f"No historical data found for {symbol}"}
+                continue
+            results[symbol] = {
+                "last_bar": str(np.datetime_as_string(
+                    np.datetime64(int(bars[TIMESTAMP, -1]), "s"), unit="D" if interval == "1d" else "m"
+                )),
+                "bars": int(bars.shape[1]),
+                "indicators": {
+                    name: indicator_engine.compute(symbol, interval, bars, name, resolved[name], points)
+                    for name in indicators
+                }
+            }
+        for symbol in timed_out:
+            results[symbol] = {"error": f"Timed out loading history for {symbol}", "timed_out": True}
+        
+        return {
+            "interval": interval,
+            "indicators": indicators,
+            "results": {symbol: results[symbol] for symbol in unique_symbols},
+            "timed_out": timed_out,
+            "timestamp": datetime.now().isoformat()
+        }
+    
     @staticmethod
     def compare_stocks(symbols: List[str]) -> Dict[str, Any]:
         try:
-            comparison_data = []
-            
-            for symbol in symbols:
-                stock_data = FunctionExecutor.get_stock_price(symbol)
-                if "error" not in stock_data:
-                    comparison_data.append(stock_data)
+            prices = FunctionExecutor.get_stock_prices(symbols)
+            comparison_data = [data for data in prices["quotes"].values() if "error" not in data]
             
             if not comparison_data:
-                return {"error": "No valid stock data found for comparison"}
+                return {"error": "No valid stock data found for comparison", "timed_out": prices["timed_out"]}
             
             return {
                 "comparison_count": len(comparison_data),
                 "stocks": comparison_data,
+                "timed_out": prices["timed_out"],
                 "comparison_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
         except Exception as e:
@@ -258,54 +1047,76 @@ class FunctionExecutor:
     @staticmethod
     def calculate_portfolio_value(holdings: List[Dict]) -> Dict[str, Any]:
         try:
-            portfolio_data = []
-            total_current_value = 0
-            total_invested = 0
-            
-            for holding in holdings:
-                symbol = holding["symbol"]
-                quantity = holding["quantity"]
-                avg_price = holding["avg_price"]
-                
-                stock_data = FunctionExecutor.get_stock_price(symbol)
-                if "error" not in stock_data:
-                    current_price = stock_data["current_price"]
-                    current_value = quantity * current_price
-                    invested_value = quantity * avg_price
-                    pnl = current_value - invested_value
-                    pnl_percent = (pnl / invested_value) * 100 if invested_value > 0 else 0
-                    
-                    portfolio_data.append({
-                        "symbol": symbol,
-                        "quantity": quantity,
-                        "avg_price": avg_price,
-                        "current_price": current_price,
-                        "current_value": round(current_value, 2),
-                        "invested_value": round(invested_value, 2),
-                        "pnl": round(pnl, 2),
-                        "pnl_percent": round(pnl_percent, 2)
-                    })
-                    
-                    total_current_value += current_value
-                    total_invested += invested_value
-            
-            total_pnl = total_current_value - total_invested
-            total_pnl_percent = (total_pnl / total_invested) * 100 if total_invested > 0 else 0
-            
+            # Lots are grouped by symbol so each symbol is quoted once
+            prices = FunctionExecutor.get_stock_prices([h["symbol"] for h in holdings])
+            portfolio_data, by_symbol, unpriced = value_holdings(holdings, prices["quotes"])
             return {
-                "portfolio_summary": {
-                    "total_invested": round(total_invested, 2),
-                    "total_current_value": round(total_current_value, 2),
-                    "total_pnl": round(total_pnl, 2),
-                    "total_pnl_percent": round(total_pnl_percent, 2),
-                    "number_of_holdings": len(portfolio_data)
-                },
+                "portfolio_summary": portfolio_summary(by_symbol, len(portfolio_data)),
                 "holdings": portfolio_data,
+                "by_symbol": by_symbol,
+                "unpriced_symbols": unpriced,
+                "timed_out": prices["timed_out"],
                 "calculation_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
         except Exception as e:
             return {"error": f"Failed to calculate portfolio: {str(e)}"}
     
+    @staticmethod
+    def analyze_portfolio_risk(holdings: List[Dict], period: str = "1y", benchmark: str = RISK_BENCHMARK,
+                               confidence: float = 0.95, include_matrices: bool = False,
+                               wait: float = RISK_WAIT_SECONDS) -> Dict[str, Any]:
+        """Portfolio risk report, computed on the analytics pool.
+
+        Returns a pending reply with a job_id if the report is not ready within
+        `wait` seconds; repeating the same call later picks up the result.
+        """
+        try:
+            period_start(period)
+        except ValueError as e:
+            return {"error": str(e)}
+        if not 0.5 <= confidence < 1:
+            return {"error": "confidence must be between 0.5 and 1"}
+        if not holdings:
+            return {"error": "No holdings provided"}
+        
+        # Lots of the same symbol are merged so the job key ignores how holdings are split
+        quantities: Dict[str, float] = {}
+        for holding in holdings:
+            symbol = holding["symbol"].strip()
+            quantities[symbol] = quantities.get(symbol, 0) + float(holding["quantity"])
+        key = {
+            "holdings": sorted([symbol, quantity] for symbol, quantity in quantities.items() if quantity),
+            "period": period, "benchmark": benchmark, "confidence": confidence,
+            "include_matrices": include_matrices
+        }
+        cached = api_cache.get_with_age("analyze_portfolio_risk", key)
+        if cached is not None:
+            return _with_cache_info(*cached)
+        
+        def compute() -> Dict[str, Any]:
+            result = _portfolio_risk(key["holdings"], period, benchmark, confidence, include_matrices)
+            if "error" not in result:
+                api_cache.set("analyze_portfolio_risk", key, result, ttl=RISK_CACHE_TTL)
+            return result
+        
+        job_id = hashlib.md5(repr(freeze(key)).encode()).hexdigest()[:16]
+        with _risk_jobs_lock:
+            job = _risk_jobs.get(job_id)
+            if job is None:
+                job = analytics_executor.submit(lambda: request_coalescer.do(
+                    "analyze_portfolio_risk", key, compute,
+                    recheck=lambda: api_cache.get("analyze_portfolio_risk", key)
+                ))
+                _risk_jobs[job_id] = job
+                job.add_done_callback(lambda _: _risk_jobs.pop(job_id, None))
+        
+        try:
+            return job.result(timeout=wait)
+        except FutureTimeoutError:
+            return {"pending": True, "job_id": job_id, "retry_after_seconds": 1}
+        except Exception as e:
+            return {"error": f"Failed to analyze portfolio risk: {str(e)}"}
+    
     @staticmethod
     def get_market_news(symbol: str = None) -> Dict[str, Any]:
         api_key = os.getenv('NEWS_API_KEY')
@@ -317,8 +1128,9 @@ class FunctionExecutor:
                 else:
                     query = symbol
                     
-                url = f"https://newsapi.org/v2/everything?q={query}&sortBy=publishedAt&apiKey={api_key}&pageSize=5&language=en"
-                response = requests.get(url, timeout=10)
+                response = newsapi_client.get(NEWS_API_URL, params={
+                    "q": query, "sortBy": "publishedAt", "apiKey": api_key, "pageSize": 5, "language": "en"
+                })
                 data = response.json()
                 
                 if data.get("status") == "ok" and data.get("articles"):
@@ -361,14 +1173,18 @@ class FunctionExecutor:
         
         return {"error": f"No news found for {symbol}"}
 
-def get_stock_context(symbol: str) -> Dict[str, Any]:
-    """Get stock context with price and change data"""
+# Quote providers in priority order, each behind its own circuit breaker
+quote_router = ProviderRouter([
+    Provider("yahoo", FunctionExecutor._yahoo_quote),
+    Provider("alpha_vantage", FunctionExecutor._alpha_vantage_quote,
+             enabled=lambda: bool(os.getenv('ALPHA_VANTAGE_API_KEY')))
+], propagate=(QuotaExceededError,))
+
+def _alpha_vantage_context(symbol: str) -> Optional[Dict[str, Any]]:
     api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
     if api_key:
         try:
-            url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={api_key}"
-            response = requests.get(url, timeout=10)
-            data = response.json()
+            data = _alpha_vantage_request({"function": "GLOBAL_QUOTE", "symbol": symbol, "apikey": api_key}) or {}
             
             if "Global Quote" in data and data["Global Quote"]:
                 quote = data["Global Quote"]
@@ -376,12 +1192,29 @@ def get_stock_context(symbol: str) -> Dict[str, Any]:
                 change = float(quote.get("09. change", 0))
                 price_change = round((change / current_price) * 100, 2) if current_price > 0 else 0
                 
-                return {
+                context = {
                     "current_price": current_price,
                     "price_change": price_change
                 }
+                api_cache.set("get_stock_context", {"symbol": symbol}, context, ttl=_quote_ttl(symbol))
+                return context
+        except QuotaExceededError:
+            raise
         except:
             pass
+    return None
+
+def get_stock_context(symbol: str) -> Dict[str, Any]:
+    """Get stock context with price and change data"""
+    context = api_cache.get("get_stock_context", {"symbol": symbol})
+    if context is None:
+        context = request_coalescer.do(
+            "get_stock_context", {"symbol": symbol},
+            lambda: _alpha_vantage_context(symbol),
+            recheck=lambda: api_cache.get("get_stock_context", {"symbol": symbol})
+        )
+    if context:
+        return context
     
     # Fallback mock data
     mock_data = {
@@ -394,13 +1227,77 @@ def get_stock_context(symbol: str) -> Dict[str, Any]:
     
     return mock_data.get(symbol, {"current_price": 0, "price_change": 0})
 
+def get_stock_contexts(symbols: List[str], timeout: float = FANOUT_TIMEOUT) -> Dict[str, Dict[str, Any]]:
+    """Get stock context for several symbols, batching the Yahoo Finance lookup.
+
+    Symbols that could not be fetched before the deadline map to an error
+    entry with timed_out set.
+    """
+    deadline = time.time() + timeout
+    unique_symbols = _unique_symbols(symbols)
+    batch = _batch_quotes_before(unique_symbols, deadline) or {}
+    
+    contexts = {}
+    for symbol, quote in batch.items():
+        if quote["previous_close"] > 0:
+            change = quote["current_price"] - quote["previous_close"]
+            contexts[symbol] = {
+                "current_price": quote["current_price"],
+                "price_change": round((change / quote["previous_close"]) * 100, 2)
+            }
+    
+    fallbacks, timed_out = upstream_executor.run_all(
+        {symbol: (lambda s=symbol: get_stock_context(s)) for symbol in unique_symbols if symbol not in contexts},
+        deadline - time.time()
+    )
+    contexts.update(fallbacks)
+    for symbol in timed_out:
+        contexts[symbol] = {"error": f"Timed out fetching {symbol}", "timed_out": True}
+    return {symbol: contexts[symbol] for symbol in unique_symbols}
+
 def execute_function(function_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
     executor = FunctionExecutor()
-    if hasattr(executor, function_name):
-        func = getattr(executor, function_name)
+    if function_name.startswith("_") or not hasattr(executor, function_name):
+        return {"error": f"Function {function_name} not found"}
+    
+    func = getattr(executor, function_name)
+    ttl = FUNCTION_CACHE_TTLS.get(function_name)
+    if not ttl:
         try:
             return func(**parameters)
         except Exception as e:
             return {"error": f"Function execution failed: {str(e)}"}
+    
+    quote_symbol = parameters.get("symbol") if function_name in QUOTE_FUNCTIONS else None
+    
+    def fetch() -> Dict[str, Any]:
+        try:
+            result = func(**parameters)
+        except Exception as e:
+            return {"error": f"Function execution failed: {str(e)}"}
+        if "error" not in result:
+            if quote_symbol:
+                _cache_quote(function_name, quote_symbol, result)
+            else:
+                api_cache.set(function_name, parameters, result, ttl=ttl)
+        return result
+    
+    if quote_symbol:
+        cached = _lookup_quote(function_name, quote_symbol)
+        if cached is not None:
+            if cached.get("stale"):
+                _revalidate_in_background(function_name, parameters, fetch)
+            return cached
     else:
-        return {"error": f"Function {function_name} not found"}
\ No newline at end of file
+        cached = api_cache.get_with_age(function_name, parameters)
+        if cached is not None:
+            return _with_cache_info(*cached)
+    
+    # Concurrent misses for the same call share one upstream fetch
+    result = request_coalescer.do(
+        function_name, parameters, fetch,
+        recheck=lambda: api_cache.get(function_name, parameters)
+    )
+    if "error" in result:
+        return result
+    return _with_cache_info(_with_fundamentals(result, quote_symbol) if quote_symbol else result)
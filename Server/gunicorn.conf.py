@@ -7,7 +7,11 @@ backlog = 2048
 
 # Worker processes
 workers = 4
-worker_class = "sync"
+# Threaded workers so open /market-stream connections do not each pin a whole worker;
+# each stream still holds a thread, so quote_stream caps them per worker
+# (QUOTE_STREAM_MAX_CLIENTS, default 8) and clients past the cap poll instead
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -40,5 +44,7 @@ tmp_upload_dir = None
 # certfile = "/path/to/certfile"
 
 # Performance tuning
+# Set CACHE_BACKEND=sqlite (and optionally CACHE_PATH) to share the API cache
+# between workers; connections are opened per worker after the fork
 preload_app = True
 enable_stdio_inheritance = True
\ No newline at end of file
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import numpy as np
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+# Row order of the stored column block; every column is float64 so one
+# (6, n) array holds a symbol and each column stays contiguous on disk
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(COLUMNS))
+
+# Calendar days covered by each history period
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 366, "2y": 731, "5y": 1827, "10y": 3653
+}
+
+def period_start(period: str, now: Optional[datetime] = None) -> Optional[float]:
+    """Epoch seconds of the first bar in a period, or None for the whole series"""
+    now = now or datetime.now()
+    if period == "max":
+        return None
+    if period == "ytd":
+        start = date(now.year, 1, 1)
+    elif period in PERIOD_DAYS:
+        start = now.date() - timedelta(days=PERIOD_DAYS[period])
+    else:
+        raise ValueError(f"Unknown history period: {period}")
+    return float((start - date(1970, 1, 1)).days * 86400)
+
+class HistoryStore:
+    """Per-symbol OHLCV bars on disk as memory-mapped NumPy column blocks.
+
+    Each symbol and interval is one .npy file of shape (6, n) sorted by
+    timestamp, plus a small JSON sidecar with the source and last sync time.
+    Files are replaced atomically, so readers in other workers keep a
+    consistent view while a sync appends the missing tail.
+    """
+
+    def __init__(self, root: str, sync_interval: float = 900):
+        self.root = root
+        self.sync_interval = sync_interval
+        self.full_fetches = 0
+        self.tail_fetches = 0
+        self.rows_appended = 0
+        self.slices_served = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, symbol: str, interval: str) -> str:
+        safe = symbol.upper().replace('/', '_').replace('^', 'IDX_')
+        return os.path.join(self.root, interval, f"{safe}.npy")
+
+    def _write_atomic(self, path: str, write) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def load(self, symbol: str, interval: str = "1d") -> Optional[np.ndarray]:
+        """Get all stored bars for a symbol as a read-only (6, n) array"""
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def meta(self, symbol: str, interval: str = "1d") -> Dict[str, Any]:
+        try:
+            with open(self._path(symbol, interval) + '.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def last_timestamp(self, symbol: str, interval: str = "1d") -> Optional[float]:
+        bars = self.load(symbol, interval)
+        if bars is None or not bars.shape[1]:
+            return None
+        return float(bars[TIMESTAMP, -1])
+
+    def needs_sync(self, symbol: str, interval: str = "1d") -> bool:
+        """Check whether the symbol was last synced more than sync_interval ago"""
+        return time.time() - self.meta(symbol, interval).get('synced_at', 0) >= self.sync_interval
+
+    def append(self, symbol: str, bars: np.ndarray, source: str, interval: str = "1d") -> int:
+        """Merge newly fetched bars into the store and return how many rows were added.
+
+        Stored bars at or after the first new timestamp are replaced, so the
+        still-forming bar of the current session is updated in place.
+        """
+        path = self._path(symbol, interval)
+        with self._lock:
+            stored = self.load(symbol, interval)
+            if stored is not None and bars.shape[1]:
+                keep = np.searchsorted(stored[TIMESTAMP], bars[TIMESTAMP, 0], side='left')
+                merged = np.concatenate([stored[:, :keep], bars], axis=1)
+            elif stored is not None:
+                merged = np.asarray(stored)
+            else:
+                merged = bars
+            added = merged.shape[1] - (stored.shape[1] if stored is not None else 0)
+
+            if stored is None or bars.shape[1]:
+                self._write_atomic(path, lambda f: np.save(f, np.ascontiguousarray(merged, dtype=np.float64)))
+            meta = {'source': source, 'synced_at': time.time(), 'rows': int(merged.shape[1])}
+            self._write_atomic(path + '.json', lambda f: f.write(json.dumps(meta).encode()))
+            self.rows_appended += max(0, added)
+        return added
+
+    def sync(self, symbol: str, fetch: Callable[[Optional[float]], Optional[Tuple[np.ndarray, str]]],
+             interval: str = "1d") -> bool:
+        """Bring a symbol up to date and report whether it has any bars to serve.
+
+        fetch(start) gets bars from the provider at or after start (the last
+        stored timestamp, or None for a full backfill) and returns (bars, source),
+        or None on failure, in which case the stored bars are served as they are.
+        """
+        last = self.last_timestamp(symbol, interval)
+        if last is not None and not self.needs_sync(symbol, interval):
+            return True
+        fetched = fetch(last)
+        if fetched is None:
+            return last is not None
+        bars, source = fetched
+        with self._lock:
+            if last is None:
+                self.full_fetches += 1
+            else:
+                self.tail_fetches += 1
+        self.append(symbol, bars, source, interval)
+        return last is not None or bars.shape[1] > 0
+
+    def slice(self, symbol: str, period: str, interval: str = "1d") -> Optional[np.ndarray]:
+        """Get the bars inside a period by binary search over the stored timestamps"""
+        bars = self.load(symbol, interval)
+        if bars is None:
+            return None
+        start = period_start(period)
+        first = 0 if start is None else int(np.searchsorted(bars[TIMESTAMP], start, side='left'))
+        self.slices_served += 1
+        return bars[:, first:]
+
+    def symbols(self, interval: str = "1d") -> List[str]:
+        directory = os.path.join(self.root, interval)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.npy'))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get stored symbol counts, disk usage and sync counters"""
+        intervals = [d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d))]
+        size = 0
+        for interval in intervals:
+            directory = os.path.join(self.root, interval)
+            for name in os.listdir(directory):
+                try:
+                    size += os.path.getsize(os.path.join(directory, name))
+                except OSError:
+                    # Temporary file renamed by a concurrent sync
+                    continue
+        return {
+            'root': self.root,
+            'symbols': {interval: len(self.symbols(interval)) for interval in intervals},
+            'disk_bytes': size,
+            'full_fetches': self.full_fetches,
+            'tail_fetches': self.tail_fetches,
+            'rows_appended': self.rows_appended,
+            'slices_served': self.slices_served
+        }
+
+# Global history store, shared on disk by every worker on the host
+history_store = HistoryStore(
+    os.getenv('HISTORY_STORE_PATH', os.path.join(tempfile.gettempdir(), 'saytrix_history')),
+    sync_interval=float(os.getenv('HISTORY_SYNC_INTERVAL', 15 * 60))
+)
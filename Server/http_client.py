@@ -0,0 +1,127 @@
+import os
+import time
+import bisect
+import threading
+from typing import Dict, Any, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+class ProviderHTTPClient:
+    """Pooled keep-alive HTTP session for one upstream data provider"""
+
+    def __init__(self, name: str, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 10, headers: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.headers = headers or {}
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._session: Optional[requests.Session] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def session(self) -> requests.Session:
+        # Sockets must not be shared with the gunicorn master or sibling
+        # workers, so each process builds its own session after the fork
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    session = requests.Session()
+                    session.headers.update(self.headers)
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._pid = os.getpid()
+                    self.requests = self.errors = self.in_flight = self.peak_in_flight = 0
+                    self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        return self._session
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None) -> requests.Response:
+        """GET through the pooled session with separate connect/read timeouts"""
+        session = self.session()
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        start_time = time.perf_counter()
+        try:
+            return session.get(url, params=params, timeout=(self.connect_timeout, timeout or self.read_timeout))
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            with self._lock:
+                self.in_flight -= 1
+                self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def _percentile_ms(self, fraction: float) -> Optional[Any]:
+        """Upper bucket bound containing the given fraction of requests; a label for the open-ended bucket"""
+        total = sum(self.histogram)
+        if not total:
+            return None
+        running = 0
+        for index, count in enumerate(self.histogram):
+            running += count
+            if running >= total * fraction:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else f">{LATENCY_BUCKETS_MS[-1]}"
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get request counts, pool usage and latency histogram"""
+        connections_opened = 0
+        if self._session is not None and self._pid == os.getpid():
+            try:
+                pools = self._session.get_adapter('https://').poolmanager.pools
+                connections_opened = sum(pools[key].num_connections for key in pools.keys())
+            except Exception:
+                pass
+
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+            return {
+                'provider': self.name,
+                'requests': self.requests,
+                'errors': self.errors,
+                'pool_size': self.pool_size,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'connections_opened': connections_opened,
+                'connect_timeout': self.connect_timeout,
+                'read_timeout': self.read_timeout,
+                'latency_histogram': dict(zip(labels, self.histogram)),
+                'p50_ms': self._percentile_ms(0.5),
+                'p95_ms': self._percentile_ms(0.95)
+            }
+
+def _build_client(name: str, headers: Optional[Dict[str, str]] = None) -> ProviderHTTPClient:
+    prefix = name.upper()
+    return ProviderHTTPClient(
+        name,
+        pool_size=int(os.getenv(f'{prefix}_POOL_SIZE', os.getenv('HTTP_POOL_SIZE', 10))),
+        connect_timeout=float(os.getenv(f'{prefix}_CONNECT_TIMEOUT', os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))),
+        read_timeout=float(os.getenv(f'{prefix}_READ_TIMEOUT', os.getenv('HTTP_READ_TIMEOUT', 10))),
+        headers=headers
+    )
+
+# Global provider clients
+alpha_vantage_client = _build_client('alpha_vantage')
+newsapi_client = _build_client('newsapi')
+# Yahoo rejects the default requests User-Agent
+yahoo_client = _build_client('yahoo', headers={'User-Agent': 'Mozilla/5.0'})
+
+def http_client_stats() -> Dict[str, Any]:
+    """Get stats for every provider client"""
+    return {client.name: client.stats() for client in (alpha_vantage_client, newsapi_client, yahoo_client)}
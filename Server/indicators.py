@@ -0,0 +1,245 @@
+import os
+import threading
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Any, Callable, Optional, Tuple
+from cache_manager import api_cache, APICache
+from history_store import TIMESTAMP, HIGH, LOW, CLOSE, VOLUME
+
+# Chunk length for the closed-form EWM; keeps decay powers far from underflow
+EWM_CHUNK = 64
+
+def _ewm(x: np.ndarray, alpha: float, last: Optional[float] = None) -> Tuple[np.ndarray, Optional[float]]:
+    """y[t] = alpha * x[t] + (1 - alpha) * y[t-1], seeded with last (or x[0]) and vectorized per chunk"""
+    decay = 1.0 - alpha
+    if decay == 0:
+        return x.copy(), float(x[-1])
+    out = np.empty_like(x)
+    last = float(x[0]) if last is None else last
+    for start in range(0, len(x), EWM_CHUNK):
+        chunk = x[start:start + EWM_CHUNK]
+        powers = decay ** np.arange(len(chunk))
+        # y[t] = decay^t * (decay * last + alpha * sum(x[i] / decay^i for i <= t))
+        out[start:start + len(chunk)] = powers * (decay * last + alpha * np.cumsum(chunk / powers))
+        last = float(out[start + len(chunk) - 1])
+    return out, last
+
+def _with_tail(x: np.ndarray, tail: Optional[np.ndarray], window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Prepend the previous segment's last window-1 values; return the joined array and the next tail"""
+    joined = x if tail is None else np.concatenate([tail, x])
+    return joined, joined[len(joined) - (window - 1):] if window > 1 else joined[:0]
+
+def _rolling_sum(x: np.ndarray, window: int, length: int) -> np.ndarray:
+    """Trailing window sums aligned to the last `length` values of x, NaN where the window is incomplete"""
+    out = np.full(length, np.nan)
+    if len(x) >= window:
+        sums = np.convolve(x, np.ones(window), mode='valid')
+        out[length - len(sums):] = sums[-length:] if len(sums) > length else sums
+    return out
+
+# Kernels are only ever called with at least one bar
+
+def _sma(bars: np.ndarray, params: Dict[str, Any], state: Dict[str, Any]):
+    period = params['period']
+    closes, tail = _with_tail(bars[CLOSE], state.get('tail'), period)
+    return {'sma': _rolling_sum(closes, period, bars.shape[1]) / period}, {'tail': tail}
+
+def _ema(bars: np.ndarray, params: Dict[str, Any], state: Dict[str, Any]):
+    ema, last = _ewm(bars[CLOSE], 2.0 / (params['period'] + 1), state.get('ema'))
+    return {'ema': ema}, {'ema': last}
+
+def _rsi(bars: np.ndarray, params: Dict[str, Any], state: Dict[str, Any]):
+    closes = bars[CLOSE]
+    previous = state.get('close', closes[0])
+    delta = np.diff(closes, prepend=previous)
+    alpha = 1.0 / params['period']
+    gain, avg_gain = _ewm(np.clip(delta, 0, None), alpha, state.get('gain'))
+    loss, avg_loss = _ewm(np.clip(-delta, 0, None), alpha, state.get('loss'))
+    rs = np.divide(gain, loss, out=np.full_like(gain, np.inf), where=loss > 0)
+    # No movement at all is neutral, not overbought
+    rsi = np.where(gain + loss > 0, 100 - 100 / (1 + rs), 50.0)
+    return {'rsi': rsi}, {'close': float(closes[-1]), 'gain': avg_gain, 'loss': avg_loss}
+
+def _macd(bars: np.ndarray, params: Dict[str, Any], state: Dict[str, Any]):
+    fast, fast_last = _ewm(bars[CLOSE], 2.0 / (params['fast'] + 1), state.get('fast'))
+    slow, slow_last = _ewm(bars[CLOSE], 2.0 / (params['slow'] + 1), state.get('slow'))
+    macd = fast - slow
+    signal, signal_last = _ewm(macd, 2.0 / (params['signal'] + 1), state.get('signal'))
+    return (
+        {'macd': macd, 'signal': signal, 'histogram': macd - signal},
+        {'fast': fast_last, 'slow': slow_last, 'signal': signal_last}
+    )
+
+def _bollinger(bars: np.ndarray, params: Dict[str, Any], state: Dict[str, Any]):
+    period = params['period']
+    closes, tail = _with_tail(bars[CLOSE], state.get('tail'), period)
+    length = bars.shape[1]
+    middle = np.full(length, np.nan)
+    deviation = np.full(length, np.nan)
+    if len(closes) >= period:
+        windows = sliding_window_view(closes, period)[-length:]
+        middle[length - len(windows):] = windows.mean(axis=1)
+        deviation[length - len(windows):] = windows.std(axis=1)
+    width = params['std'] * deviation
+    return {'middle': middle, 'upper': middle + width, 'lower': middle - width}, {'tail': tail}
+
+def _atr(bars: np.ndarray, params: Dict[str, Any], state: Dict[str, Any]):
+    highs, lows, closes = bars[HIGH], bars[LOW], bars[CLOSE]
+    previous = np.concatenate([[state.get('close', np.nan)], closes[:-1]])
+    # The very first bar has no previous close, so its range is high - low
+    true_range = np.fmax(highs - lows, np.fmax(np.abs(highs - previous), np.abs(lows - previous)))
+    atr, last = _ewm(true_range, 1.0 / params['period'], state.get('atr'))
+    return {'atr': atr}, {'close': float(closes[-1]), 'atr': last}
+
+def _vwap(bars: np.ndarray, params: Dict[str, Any], state: Dict[str, Any]):
+    period = params['period']
+    typical = (bars[HIGH] + bars[LOW] + bars[CLOSE]) / 3
+    turnover, turnover_tail = _with_tail(typical * bars[VOLUME], state.get('turnover'), period)
+    volume, volume_tail = _with_tail(bars[VOLUME], state.get('volume'), period)
+    length = bars.shape[1]
+    total_volume = _rolling_sum(volume, period, length)
+    vwap = np.divide(
+        _rolling_sum(turnover, period, length), total_volume,
+        out=np.full(length, np.nan), where=total_volume > 0
+    )
+    return {'vwap': vwap}, {'turnover': turnover_tail, 'volume': volume_tail}
+
+class Indicator:
+    """A kernel mapping (bars, params, state) to (output series, state after the last bar)"""
+
+    def __init__(self, kernel: Callable, defaults: Dict[str, Any], warmup: Callable[[Dict[str, Any]], int]):
+        self.kernel = kernel
+        self.defaults = defaults
+        self.warmup = warmup
+
+INDICATORS = {
+    'sma': Indicator(_sma, {'period': 20}, lambda p: p['period'] - 1),
+    'ema': Indicator(_ema, {'period': 20}, lambda p: p['period'] - 1),
+    'rsi': Indicator(_rsi, {'period': 14}, lambda p: p['period']),
+    'macd': Indicator(_macd, {'fast': 12, 'slow': 26, 'signal': 9}, lambda p: p['slow'] + p['signal'] - 2),
+    'bollinger': Indicator(_bollinger, {'period': 20, 'std': 2}, lambda p: p['period'] - 1),
+    'atr': Indicator(_atr, {'period': 14}, lambda p: p['period']),
+    # Rolling VWAP over the last `period` bars
+    'vwap': Indicator(_vwap, {'period': 20}, lambda p: p['period'] - 1)
+}
+
+class IndicatorEngine:
+    """Computes indicators over stored bars, extending cached series as new bars arrive.
+
+    Each (symbol, interval, indicator, params) keeps its series up to the
+    second-to-last bar together with the kernel state at that point. A new
+    request runs the kernel only over bars after that checkpoint, so the
+    still-forming last bar is recomputed but history never is.
+    """
+
+    def __init__(self, checkpoints: APICache, results=api_cache, result_ttl: int = 24 * 60 * 60):
+        self.checkpoints = checkpoints
+        self.results = results
+        self.result_ttl = result_ttl
+        self.full_computes = 0
+        self.incremental_updates = 0
+        self.bars_computed = 0
+        self.result_hits = 0
+        self._lock = threading.Lock()
+
+    def resolve_params(self, name: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Merge requested params over the defaults, rejecting unknown or non-positive values"""
+        indicator = INDICATORS[name]
+        params = {**indicator.defaults, **(params or {})}
+        for key, value in params.items():
+            if key not in indicator.defaults:
+                raise ValueError(f"Unknown parameter for {name}: {key}")
+            if not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"{name} {key} must be a positive number")
+            if isinstance(indicator.defaults[key], int) and not isinstance(value, int):
+                raise ValueError(f"{name} {key} must be a whole number of bars")
+        return params
+
+    def _series(self, symbol: str, interval: str, bars: np.ndarray, name: str,
+                params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        kernel = INDICATORS[name].kernel
+        key = {'symbol': symbol, 'interval': interval, 'indicator': name, 'params': params}
+        count = bars.shape[1]
+        checkpoint = self.checkpoints.get('indicator_checkpoint', key)
+
+        # Reuse the checkpoint only if the bars it covered are unchanged
+        covered = checkpoint['covered'] if checkpoint else 0
+        if not (checkpoint and 0 < covered < count
+                and bars[TIMESTAMP, 0] == checkpoint['first_ts']
+                and bars[TIMESTAMP, covered - 1] == checkpoint['last_ts']):
+            checkpoint, covered = None, 0
+
+        state = checkpoint['state'] if checkpoint else {}
+        head = checkpoint['series'] if checkpoint else None
+        if covered < count - 1:
+            segment, state = kernel(bars[:, covered:count - 1], params, state)
+            head = {k: np.concatenate([head[k], v]) for k, v in segment.items()} if head else segment
+        last, _ = kernel(bars[:, count - 1:], params, state)
+        if head is None:
+            head = {k: v[:0] for k, v in last.items()}
+
+        if count > 1:
+            self.checkpoints.set('indicator_checkpoint', key, {
+                'covered': count - 1,
+                'first_ts': float(bars[TIMESTAMP, 0]),
+                'last_ts': float(bars[TIMESTAMP, count - 2]),
+                'state': state,
+                'series': head
+            })
+        with self._lock:
+            if checkpoint:
+                self.incremental_updates += 1
+            else:
+                self.full_computes += 1
+            self.bars_computed += count - covered
+        return {k: np.concatenate([head[k], last[k]]) for k in head}
+
+    def compute(self, symbol: str, interval: str, bars: np.ndarray, name: str,
+                params: Optional[Dict[str, Any]] = None, points: int = 1) -> Dict[str, Any]:
+        """Get the last `points` values of an indicator, cached per last bar"""
+        params = self.resolve_params(name, params)
+        result_key = {
+            'symbol': symbol, 'interval': interval, 'indicator': name, 'params': params,
+            'points': points, 'last_bar': float(bars[TIMESTAMP, -1]), 'last_close': float(bars[CLOSE, -1])
+        }
+        cached = self.results.get('technical_indicator', result_key)
+        if cached is not None:
+            with self._lock:
+                self.result_hits += 1
+            return cached
+
+        series = self._series(symbol, interval, bars, name, params)
+        warmup = INDICATORS[name].warmup(params)
+        first = max(0, bars.shape[1] - points)
+        values = {}
+        for output, data in series.items():
+            tail = data[first:].copy()
+            # Values inside the warm-up window are not meaningful yet
+            tail[:max(0, warmup - first)] = np.nan
+            rounded = np.round(tail, 4).tolist()
+            values[output] = [None if np.isnan(v) else v for v in rounded]
+
+        result = {
+            'params': params,
+            'values': {k: v[-1] for k, v in values.items()} if points == 1 else values
+        }
+        self.results.set('technical_indicator', result_key, result, ttl=self.result_ttl)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Get compute counters and the checkpoint cache footprint"""
+        return {
+            'indicators': sorted(INDICATORS),
+            'full_computes': self.full_computes,
+            'incremental_updates': self.incremental_updates,
+            'bars_computed': self.bars_computed,
+            'result_hits': self.result_hits,
+            'checkpoints': self.checkpoints.stats()
+        }
+
+# Global indicator engine; checkpoints hold NumPy state, so they stay in process memory
+indicator_engine = IndicatorEngine(APICache(
+    default_ttl=24 * 60 * 60,
+    max_entries=int(os.getenv('INDICATOR_CHECKPOINTS', 2048)),
+    max_bytes=64 * 1024 * 1024
+))
@@ -1,4 +1,8 @@
 import re
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+from symbol_master import symbol_master
 
 def is_greeting(text):
     """Check if text is a greeting, not a stock symbol"""
@@ -25,4 +29,94 @@ def should_lookup_stock(text):
     if len(text_clean) >= 2 and len(text_clean) <= 5 and text_clean.isupper():
         return True
         
-    return False
\ No newline at end of file
+    return False
+
+
+# Words that never change what a message asks for
+FILLER_WORDS = {
+    'hi', 'hello', 'hey', 'please', 'pls', 'thanks', 'thank', 'the', 'a', 'an', 'of', 'for', 'on',
+    'me', 'my', 'show', 'tell', 'give', 'get', 'check', 'what', 'whats', 'is', 'are', 'current',
+    'currently', 'today', 'now', 'live', 'latest', 'can', 'you', 'i', 'want', 'to', 'see', 'know'
+}
+
+# Routing table, checked in order. A message takes the first intent whose symbol
+# count fits and whose vocabulary covers every word left after removing company
+# mentions; intents with needs_keyword also require one of their keywords.
+INTENT_TABLE = [
+    {'intent': 'greeting', 'keywords': {'hi', 'hello', 'hey', 'namaste', 'morning', 'afternoon', 'evening'},
+     'vocabulary': {'good', 'there', 'saytrix'}, 'min_symbols': 0, 'max_symbols': 0, 'needs_keyword': True},
+    {'intent': 'comparison', 'keywords': {'compare', 'comparison', 'vs', 'versus'},
+     'vocabulary': {'and', 'with', 'between', 'or', 'price', 'prices', 'quote', 'quotes', 'stock', 'stocks', 'share', 'shares'},
+     'min_symbols': 2, 'max_symbols': None, 'needs_keyword': False},
+    {'intent': 'price', 'keywords': {'price', 'quote', 'ltp', 'rate'},
+     'vocabulary': {'stock', 'share', 'trading', 'at', 'value', 'data'}, 'min_symbols': 1, 'max_symbols': 1, 'needs_keyword': False},
+    {'intent': 'portfolio', 'keywords': {'portfolio', 'holdings', 'p&l', 'pnl'},
+     'vocabulary': {'calculate', 'review', 'manage', 'value'}, 'min_symbols': 0, 'max_symbols': 0, 'needs_keyword': True},
+    {'intent': 'news', 'keywords': {'news', 'headlines'},
+     'vocabulary': {'market', 'stock', 'about', 'any', 'updates'}, 'min_symbols': 0, 'max_symbols': 1, 'needs_keyword': True}
+]
+
+# Everything the table does not claim goes to the LLM
+OPEN_INTENT = 'open'
+
+class IntentRouter:
+    """Table-driven intent routing over the company mentions a symbol master finds.
+
+    The table is compiled once into frozen word sets, so routing a message is
+    one symbol-master pass plus a few set lookups. Intents other than 'open'
+    can be answered from templates without calling the LLM.
+    """
+
+    def __init__(self, symbol_master, table=INTENT_TABLE):
+        self.symbol_master = symbol_master
+        self.rules = [
+            (rule['intent'], frozenset(rule['keywords']),
+             frozenset(rule['keywords'] | rule['vocabulary'] | FILLER_WORDS),
+             rule['min_symbols'], rule['max_symbols'], rule['needs_keyword'])
+            for rule in table
+        ]
+        self.routed = Counter()
+        self.template_answers = 0
+        self.llm_calls = 0
+        self.llm_calls_avoided = 0
+        self._lock = threading.Lock()
+
+    def route(self, message: str) -> Tuple[str, List[str]]:
+        """Get the intent of a message and the symbols it mentions"""
+        symbols, words = self.symbol_master.mentions(message)
+        intent = OPEN_INTENT
+        for name, keywords, vocabulary, min_symbols, max_symbols, needs_keyword in self.rules:
+            if len(symbols) < min_symbols or (max_symbols is not None and len(symbols) > max_symbols):
+                continue
+            if not vocabulary.issuperset(words):
+                continue
+            if needs_keyword and keywords.isdisjoint(words):
+                continue
+            intent = name
+            break
+        with self._lock:
+            self.routed[intent] += 1
+        return intent, symbols
+
+    def record_answer(self, used_llm: bool, llm_available: bool = True) -> None:
+        """Count how a routed message was answered"""
+        with self._lock:
+            if used_llm:
+                self.llm_calls += 1
+            else:
+                self.template_answers += 1
+                if llm_available:
+                    self.llm_calls_avoided += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get routing and LLM-avoidance counters"""
+        with self._lock:
+            return {
+                'routed': dict(self.routed),
+                'template_answers': self.template_answers,
+                'llm_calls': self.llm_calls,
+                'llm_calls_avoided': self.llm_calls_avoided
+            }
+
+# Global intent router over the symbol master
+intent_router = IntentRouter(symbol_master)
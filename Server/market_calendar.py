@@ -0,0 +1,75 @@
+import os
+import json
+from datetime import datetime, date, time as dt_time, timedelta
+from typing import Dict, Any, Optional
+from zoneinfo import ZoneInfo
+
+CALENDAR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_calendar.json')
+
+class MarketCalendar:
+    """Trading sessions, weekends and holidays for the exchanges we quote"""
+
+    def __init__(self, path: str = CALENDAR_PATH):
+        with open(path) as f:
+            config = json.load(f)
+
+        self.exchanges: Dict[str, Dict[str, Any]] = {}
+        for name, exchange in config['exchanges'].items():
+            self.exchanges[name] = {
+                'timezone': ZoneInfo(exchange['timezone']),
+                'open': dt_time.fromisoformat(exchange['open']),
+                'close': dt_time.fromisoformat(exchange['close']),
+                'holidays': {date.fromisoformat(d) for d in exchange['holidays']}
+            }
+        self.symbol_exchanges = config.get('symbol_exchanges', {})
+        self.suffix_exchanges = config.get('suffix_exchanges', {})
+        self.default_exchange = config.get('default_exchange', 'US')
+
+    def exchange_for_symbol(self, symbol: str) -> str:
+        """Map a ticker to the exchange whose session governs it"""
+        symbol = (symbol or '').upper()
+        if symbol in self.symbol_exchanges:
+            return self.symbol_exchanges[symbol]
+        for suffix, exchange in self.suffix_exchanges.items():
+            if symbol.endswith(suffix):
+                return exchange
+        return self.default_exchange
+
+    def is_trading_day(self, exchange: str, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.exchanges[exchange]['holidays']
+
+    def is_open(self, exchange: str, at: Optional[datetime] = None) -> bool:
+        """Check whether the exchange is in its regular session"""
+        config = self.exchanges[exchange]
+        local = (at or datetime.now(config['timezone'])).astimezone(config['timezone'])
+        return (
+            self.is_trading_day(exchange, local.date())
+            and config['open'] <= local.time() < config['close']
+        )
+
+    def next_open(self, exchange: str, at: Optional[datetime] = None) -> datetime:
+        """Get the start of the next session at or after the given time"""
+        config = self.exchanges[exchange]
+        local = (at or datetime.now(config['timezone'])).astimezone(config['timezone'])
+        day = local.date()
+        for _ in range(366):
+            if self.is_trading_day(exchange, day):
+                session_open = datetime.combine(day, config['open'], tzinfo=config['timezone'])
+                if session_open >= local:
+                    return session_open
+            day += timedelta(days=1)
+        raise ValueError(f"No trading day found for {exchange} within a year")
+
+    def is_symbol_market_open(self, symbol: str, at: Optional[datetime] = None) -> bool:
+        return self.is_open(self.exchange_for_symbol(symbol), at)
+
+    def quote_ttl(self, symbol: str, session_ttl: float, at: Optional[datetime] = None) -> float:
+        """Quote TTL: session_ttl while trading, otherwise until the next session opens"""
+        exchange = self.exchange_for_symbol(symbol)
+        if self.is_open(exchange, at):
+            return session_ttl
+        now = at or datetime.now(self.exchanges[exchange]['timezone'])
+        return max(session_ttl, (self.next_open(exchange, now) - now).total_seconds())
+
+# Global market calendar
+market_calendar = MarketCalendar()
@@ -0,0 +1,121 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from functions import get_stock_contexts
+from cache_manager import api_cache
+from quota_governor import alpha_vantage_quota
+
+logger = logging.getLogger(__name__)
+
+# Index and watchlist board shown by the market widget
+MARKET_SYMBOLS = ["NIFTY", "SENSEX", "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS"]
+
+def board_row(symbol: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    """Market widget row for a symbol's stock context"""
+    return {
+        "symbol": symbol,
+        "name": symbol.replace(".NS", ""),
+        "price": f"{context['current_price']:,}",
+        "change": context['price_change']
+    }
+
+def build_market_board(symbols: List[str]) -> Dict[str, Any]:
+    """Fetch the board rows for the given symbols"""
+    contexts = get_stock_contexts(symbols)
+    market_data_list = [board_row(symbol, contexts[symbol]) for symbol in symbols if "error" not in contexts[symbol]]
+    timed_out = [symbol for symbol in symbols if contexts[symbol].get("timed_out")]
+    return {"market_data": market_data_list, "partial": bool(timed_out), "timed_out": timed_out}
+
+class MarketSnapshot:
+    """Market board kept fresh by a background thread and served without touching providers"""
+
+    def __init__(self, symbols: List[str], interval: float = 30):
+        self.symbols = symbols
+        self.interval = interval
+        self.refreshes = 0
+        self.adopted = 0
+        self.errors = 0
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._payload: Optional[str] = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        # Started on first use in each worker: a thread started in the
+        # gunicorn master before the fork would not exist in the workers
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            thread = threading.Thread(target=self._run, name='market-snapshot', daemon=True)
+            thread.start()
+
+    def _run(self) -> None:
+        # Scheduled refreshes yield provider quota to interactive requests
+        with alpha_vantage_quota.policy(priority='background'):
+            while not self._stop.wait(self.interval):
+                self.refresh()
+
+    def refresh(self) -> Dict[str, Any]:
+        """Rebuild the snapshot, reusing one another worker published this interval"""
+        try:
+            shared = api_cache.get("market_snapshot", {"symbols": self.symbols})
+            current = self._snapshot
+            if shared and (current is None or shared["updated_at"] > current["updated_at"]):
+                self._publish(shared)
+                self.adopted += 1
+                return shared
+
+            board = build_market_board(self.symbols)
+            version = max(current["version"] if current else 0, shared["version"] if shared else 0)
+            if current is None or board["market_data"] != current["market_data"]:
+                version += 1
+            snapshot = {**board, "version": version, "updated_at": datetime.now().isoformat()}
+            self._publish(snapshot)
+            api_cache.set("market_snapshot", {"symbols": self.symbols}, snapshot, ttl=self.interval)
+            self.refreshes += 1
+            return snapshot
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Market snapshot refresh failed: {e}")
+            return self._snapshot
+
+    def _publish(self, snapshot: Dict[str, Any]) -> None:
+        # Serialized once per refresh so requests only hand out a prebuilt body
+        payload = json.dumps(snapshot)
+        with self._lock:
+            self._snapshot = snapshot
+            self._payload = payload
+
+    def payload(self) -> str:
+        """Get the current snapshot as a JSON string"""
+        if self._payload is None:
+            self.refresh()
+        self._ensure_started()
+        return self._payload
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get refresh counters and the current version"""
+        snapshot = self._snapshot or {}
+        return {
+            'symbols': self.symbols,
+            'interval_seconds': self.interval,
+            'version': snapshot.get('version'),
+            'updated_at': snapshot.get('updated_at'),
+            'refreshes': self.refreshes,
+            'adopted_from_other_workers': self.adopted,
+            'errors': self.errors
+        }
+
+# Global market snapshot
+market_snapshot = MarketSnapshot(MARKET_SYMBOLS, interval=float(os.getenv('MARKET_SNAPSHOT_INTERVAL', 30)))
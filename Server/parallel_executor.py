@@ -0,0 +1,88 @@
+import os
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Any, Callable, List, Tuple, Optional
+
+class ParallelExecutor:
+    """Bounded thread pool for independent upstream calls with an overall deadline"""
+
+    def __init__(self, max_workers: int = 8, name: str = 'upstream'):
+        self.max_workers = max_workers
+        self.name = name
+        self.timeouts = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork, so each gunicorn worker gets its own pool
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def run_all(self, tasks: Dict[str, Callable[[], Any]], timeout: float) -> Tuple[Dict[str, Any], List[str]]:
+        """Run tasks concurrently, returning results finished before the deadline and the keys that timed out.
+
+        Calls still running at the deadline are left to finish in the background
+        so their results can still land in the cache.
+        """
+        if not tasks:
+            return {}, []
+        if timeout <= 0:
+            return {}, list(tasks)
+
+        executor = self._executor()
+        # Tasks run in a copy of the caller's context so per-call settings such as
+        # the quota priority follow them onto the pool threads
+        futures = {executor.submit(contextvars.copy_context().run, task): key for key, task in tasks.items()}
+        done, _ = wait(futures, timeout=timeout)
+
+        results = {}
+        for future in done:
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = {"error": f"{key} failed: {str(e)}"}
+
+        timed_out = [key for future, key in futures.items() if future not in done]
+        if timed_out:
+            with self._lock:
+                self.timeouts += len(timed_out)
+        return results, timed_out
+
+    def submit(self, task: Callable[[], Any]) -> Future:
+        """Run a task in the background, returning its future"""
+        return self._executor().submit(contextvars.copy_context().run, task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool size and deadline miss counter"""
+        return {
+            'max_workers': self.max_workers,
+            'timeouts': self.timeouts
+        }
+
+# Global executor for upstream fan-out
+upstream_executor = ParallelExecutor(max_workers=int(os.getenv('UPSTREAM_MAX_WORKERS', 8)))
+
+# Global executor for CPU-heavy analytics, kept apart so it never delays upstream calls
+analytics_executor = ParallelExecutor(max_workers=int(os.getenv('ANALYTICS_MAX_WORKERS', 2)), name='analytics')
+
+# Global executor for stale-while-revalidate refreshes; a refresh fans out to the
+# upstream pool itself, so running it there could leave that fan-out no threads
+refresh_executor = ParallelExecutor(max_workers=int(os.getenv('REFRESH_MAX_WORKERS', 2)), name='refresh')
+
+# Global executor for ticker.info fundamentals refreshes, the slowest Yahoo call;
+# kept small and apart so a cold cache cannot occupy the request-path pools
+fundamentals_executor = ParallelExecutor(max_workers=int(os.getenv('FUNDAMENTALS_MAX_WORKERS', 2)), name='fundamentals')
+
+# Global executor for chat pipeline stages; separate from upstream so a stage that
+# fans out to the upstream pool never waits on its own threads
+chat_executor = ParallelExecutor(max_workers=int(os.getenv('CHAT_STAGE_WORKERS', 16)), name='chat')
+
+# Global executor for bookkeeping writes; a single thread keeps them in submission order
+bookkeeping_executor = ParallelExecutor(max_workers=1, name='bookkeeping')
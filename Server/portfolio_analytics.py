@@ -0,0 +1,116 @@
+import numpy as np
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional
+
+TRADING_DAYS = 252
+
+def align_closes(grid: np.ndarray, series: List[np.ndarray]) -> np.ndarray:
+    """Align (timestamps, closes) pairs onto a date grid as a (T, N) matrix.
+
+    Each column carries its last close at or before every grid date forward,
+    so holdings on different exchange calendars line up; dates before a
+    symbol's first bar are NaN.
+    """
+    closes = np.full((len(grid), len(series)), np.nan)
+    for column, (timestamps, values) in enumerate(series):
+        index = np.searchsorted(timestamps, grid, side='right') - 1
+        closes[:, column] = np.where(index >= 0, values[np.clip(index, 0, None)], np.nan)
+    return closes
+
+def _drawdown(returns: np.ndarray) -> Dict[str, Any]:
+    # Equity starts at 1 on the first grid date, so indices line up with the dates
+    equity = np.concatenate([[1.0], np.cumprod(1 + returns)])
+    peaks = np.maximum.accumulate(equity)
+    drawdowns = equity / peaks - 1
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(equity[:trough + 1])) if trough else 0
+    return {'max_drawdown': float(drawdowns[trough]), 'peak_index': peak, 'trough_index': trough}
+
+def risk_metrics(weights: np.ndarray, returns: np.ndarray, benchmark: Optional[np.ndarray] = None,
+                 confidence: float = 0.95) -> Dict[str, Any]:
+    """Portfolio risk from value weights (N,) and aligned daily returns (T, N) in one vectorized pass"""
+    portfolio = returns @ weights
+    centered = returns - returns.mean(axis=0)
+    covariance = centered.T @ centered / (len(returns) - 1)
+    volatility = np.sqrt(np.diag(covariance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.outer(volatility, volatility)
+    portfolio_volatility = float(np.sqrt(weights @ covariance @ weights))
+
+    # Historical VaR/CVaR come straight from the return distribution, parametric VaR assumes normality
+    cutoff = np.quantile(portfolio, 1 - confidence)
+    z_score = NormalDist().inv_cdf(confidence)
+
+    metrics = {
+        'observations': int(len(returns)),
+        'volatility_daily': portfolio_volatility,
+        'volatility_annual': portfolio_volatility * np.sqrt(TRADING_DAYS),
+        'holding_volatility_annual': volatility * np.sqrt(TRADING_DAYS),
+        'covariance': covariance,
+        'correlation': correlation,
+        'var_historical': float(-cutoff),
+        'cvar_historical': float(-portfolio[portfolio <= cutoff].mean()),
+        'var_parametric': float(z_score * portfolio_volatility - portfolio.mean()),
+        **_drawdown(portfolio)
+    }
+
+    if benchmark is not None:
+        market = benchmark - benchmark.mean()
+        betas = centered.T @ market / (market @ market)
+        metrics['holding_betas'] = betas
+        metrics['beta'] = float(weights @ betas)
+        metrics['benchmark_correlation'] = float(np.corrcoef(portfolio, benchmark)[0, 1])
+
+    absolute = np.abs(weights)
+    order = np.argsort(-absolute)
+    herfindahl = float(np.sum(absolute ** 2))
+    metrics['concentration'] = {
+        'herfindahl_index': herfindahl,
+        'effective_holdings': 1 / herfindahl if herfindahl else 0,
+        'top_weight': float(absolute[order[0]]),
+        'top_5_weight': float(absolute[order[:5]].sum()),
+        'top_index': int(order[0])
+    }
+    return metrics
+
+def correlated_pairs(correlation: np.ndarray, count: int = 5) -> List[tuple]:
+    """Indices and values of the most correlated distinct pairs"""
+    rows, cols = np.triu_indices(len(correlation), k=1)
+    values = correlation[rows, cols]
+    top = np.argsort(-np.nan_to_num(values, nan=-np.inf))[:count]
+    return [(int(rows[i]), int(cols[i]), float(values[i])) for i in top]
+
+def value_lots(quantities: np.ndarray, avg_prices: np.ndarray, prices: np.ndarray,
+               inverse: np.ndarray, symbol_count: int) -> Dict[str, np.ndarray]:
+    """Per-lot and per-symbol value and P&L; prices are per symbol, NaN where no quote was found"""
+    lot_prices = prices[inverse]
+    priced = ~np.isnan(lot_prices)
+    invested = quantities * avg_prices
+    current = np.where(priced, quantities * lot_prices, 0.0)
+    pnl = np.where(priced, current - invested, 0.0)
+
+    def by_symbol(values: np.ndarray) -> np.ndarray:
+        return np.bincount(inverse, weights=np.where(priced, values, 0.0), minlength=symbol_count)
+
+    symbol_quantity = by_symbol(quantities)
+    symbol_invested = by_symbol(invested)
+    symbol_current = by_symbol(current)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lot_pnl_percent = np.where(invested > 0, pnl / invested * 100, 0.0)
+        symbol_pnl_percent = np.where(symbol_invested > 0, (symbol_current - symbol_invested) / symbol_invested * 100, 0.0)
+        symbol_avg_price = np.where(symbol_quantity != 0, symbol_invested / symbol_quantity, 0.0)
+    return {
+        'priced': priced,
+        'lot_price': lot_prices,
+        'lot_invested': invested,
+        'lot_current': current,
+        'lot_pnl': pnl,
+        'lot_pnl_percent': lot_pnl_percent,
+        'symbol_lots': np.bincount(inverse, weights=priced.astype(np.float64), minlength=symbol_count),
+        'symbol_quantity': symbol_quantity,
+        'symbol_avg_price': symbol_avg_price,
+        'symbol_invested': symbol_invested,
+        'symbol_current': symbol_current,
+        'symbol_pnl': symbol_current - symbol_invested,
+        'symbol_pnl_percent': symbol_pnl_percent
+    }
@@ -0,0 +1,130 @@
+import json
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from database import db
+from functions import FunctionExecutor, value_holdings, portfolio_summary, quote_price
+
+def validate_holdings(holdings: Any) -> Optional[str]:
+    """Error message for a malformed holdings list, or None"""
+    if not isinstance(holdings, list):
+        return "holdings must be a list"
+    for i, holding in enumerate(holdings):
+        if not isinstance(holding, dict) or not isinstance(holding.get("symbol"), str) or not holding["symbol"].strip():
+            return f"Holding {i} needs a symbol"
+        for field in ("quantity", "avg_price"):
+            value = holding.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                return f"Holding {i} needs a non-negative {field}"
+    return None
+
+class PortfolioSnapshots:
+    """P&L for saved portfolios, recomputed only for symbols whose price moved.
+
+    The last valuation is stored with the portfolio together with the price
+    used for each symbol. A refresh quotes the portfolio's symbols (usually
+    straight from the quote cache), and revalues only the lots of symbols
+    whose price differs; everything else is carried over from the snapshot.
+    """
+
+    def __init__(self, database):
+        self.db = database
+        self.full_recomputes = 0
+        self.incremental_recomputes = 0
+        self.unchanged = 0
+        self.lots_recomputed = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _holdings_hash(holdings: List[Dict[str, Any]]) -> str:
+        return hashlib.md5(json.dumps(holdings, sort_keys=True, default=str).encode()).hexdigest()
+
+    def save(self, user_id: str, holdings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Replace the user's holdings and return a fresh valuation"""
+        self.db.save_portfolio(user_id, [
+            {"symbol": h["symbol"].strip().upper(), "quantity": h["quantity"], "avg_price": h["avg_price"]}
+            for h in holdings
+        ])
+        return self.valuation(user_id)
+
+    def valuation(self, user_id: str) -> Dict[str, Any]:
+        """Current P&L for the user's saved portfolio"""
+        portfolio = self.db.get_portfolio(user_id)
+        if not portfolio:
+            return {"error": "No saved portfolio"}
+        holdings = portfolio["holdings"]
+        snapshot = portfolio.get("snapshot")
+        holdings_hash = self._holdings_hash(holdings)
+
+        prices = FunctionExecutor.get_stock_prices([h["symbol"] for h in holdings])
+        current = {symbol: quote_price(prices["quotes"], symbol) for symbol in {h["symbol"].strip() for h in holdings}}
+
+        reusable = bool(snapshot) and snapshot["holdings_hash"] == holdings_hash
+        if reusable:
+            previous = {row["symbol"]: row["price"] for row in snapshot["prices"]}
+            # A quote that timed out keeps its last known valuation instead of dropping out
+            changed = {
+                symbol for symbol, price in current.items()
+                if previous.get(symbol) != price and symbol not in prices["timed_out"]
+            }
+            lots = [row for row in snapshot["holdings"] if row["symbol"].strip() not in changed]
+            symbols = [row for row in snapshot["by_symbol"] if row["symbol"] not in changed]
+            unpriced = [symbol for symbol in snapshot["unpriced_symbols"] if symbol not in changed]
+        else:
+            changed = set(current)
+            lots, symbols, unpriced = [], [], []
+
+        indices = [i for i, h in enumerate(holdings) if h["symbol"].strip() in changed]
+        if changed or not reusable:
+            new_lots, new_symbols, new_unpriced = value_holdings(
+                [holdings[i] for i in indices], prices["quotes"], lot_numbers=indices
+            )
+            lots = sorted(lots + new_lots, key=lambda row: row["lot"])
+            symbols = sorted(symbols + new_symbols, key=lambda row: row["symbol"])
+            unpriced = sorted(unpriced + new_unpriced)
+            snapshot = {
+                "holdings_hash": holdings_hash,
+                "prices": [
+                    {"symbol": symbol, "price": previous.get(symbol) if symbol not in changed else price}
+                    for symbol, price in sorted(current.items())
+                ] if reusable else [{"symbol": symbol, "price": price} for symbol, price in sorted(current.items())],
+                "holdings": lots,
+                "by_symbol": symbols,
+                "unpriced_symbols": unpriced,
+                "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self.db.save_portfolio_snapshot(user_id, snapshot)
+
+        with self._lock:
+            if not reusable:
+                self.full_recomputes += 1
+            elif changed:
+                self.incremental_recomputes += 1
+            else:
+                self.unchanged += 1
+            self.lots_recomputed += len(indices)
+
+        return {
+            "saved_holdings": holdings,
+            "portfolio_summary": portfolio_summary(snapshot["by_symbol"], len(snapshot["holdings"])),
+            "holdings": snapshot["holdings"],
+            "by_symbol": snapshot["by_symbol"],
+            "unpriced_symbols": snapshot["unpriced_symbols"],
+            "timed_out": prices["timed_out"],
+            "repriced_symbols": len(changed),
+            "snapshot_updated_at": snapshot["updated_at"],
+            "calculation_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Get recompute counters"""
+        return {
+            'full_recomputes': self.full_recomputes,
+            'incremental_recomputes': self.incremental_recomputes,
+            'unchanged': self.unchanged,
+            'lots_recomputed': self.lots_recomputed
+        }
+
+# Global portfolio snapshots over the application database
+portfolio_snapshots = PortfolioSnapshots(db)
@@ -1,11 +1,40 @@
+import os
 import time
 import json
 import logging
-from typing import Dict, Any, List
+import tempfile
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-from functions import FunctionExecutor
+from functions import FunctionExecutor, execute_function, quote_router, _bars_from_frame, _history_payload, _with_fundamentals
+from history_store import PERIOD_DAYS
+from indicators import IndicatorEngine, INDICATORS
+from portfolio_analytics import align_closes, risk_metrics, value_lots
+from parallel_executor import analytics_executor
 from prompt_templates import ClosedWorldPrompts, validate_ai_response
-from cache_manager import api_cache
+from cache_manager import api_cache, APICache, SharedAPICache
+from request_coalescer import RequestCoalescer, request_coalescer
+from provider_router import Provider, ProviderRouter, ProviderSkipped, CircuitBreaker
+from quota_governor import QuotaGovernor, QuotaExceededError, alpha_vantage_quota
+from quote_stream import QuoteStream
+from symbol_master import SymbolMaster, SYMBOL_MASTER_PATH
+from intent_classifier import IntentRouter, OPEN_INTENT
+from response_cache import LLMResponseCache
+from chat_stream import ChatStream
+from chat_pipeline import ChatPipeline, Stage
+from parallel_executor import ParallelExecutor
+
+def _simulated_worker(cache, symbols: List[str], upstream_calls) -> None:
+    """Look up each symbol once, counting the lookups that would go upstream"""
+    for symbol in symbols:
+        if cache.get('get_stock_price', {'symbol': symbol}) is None:
+            with upstream_calls.get_lock():
+                upstream_calls.value += 1
+            cache.set('get_stock_price', {'symbol': symbol}, {'symbol': symbol, 'current_price': 100.0}, ttl=60)
 
 class ProductionPipeline:
     def __init__(self):
@@ -50,31 +79,618 @@ class ProductionPipeline:
         return {
             'average_latency_ms': round(avg_latency, 2),
             'success_rate': sum(1 for r in results if r['success']) / len(results),
+            'quote_path_comparison': self._compare_quote_paths(symbols),
             'results': results
         }
     
+    def _compare_quote_paths(self, symbols: List[str]) -> Dict[str, Any]:
+        """Compare the old info+history quote path with the fast quote path"""
+        comparison = []
+        for symbol in symbols:
+            # Before: ticker.info and history on every request
+            start_time = time.time()
+            try:
+                ticker = yf.Ticker(symbol)
+                ticker.info
+                ticker.history(period="1d")
+            except Exception:
+                pass
+            before_ms = (time.time() - start_time) * 1000
+            
+            # After: history only, fundamentals served from the cache
+            FunctionExecutor._yahoo_fundamentals(symbol)
+            start_time = time.time()
+            _with_fundamentals(FunctionExecutor._yahoo_quote(symbol) or {}, symbol)
+            after_ms = (time.time() - start_time) * 1000
+            
+            comparison.append({
+                'symbol': symbol,
+                'before_ms': round(before_ms, 2),
+                'after_ms': round(after_ms, 2)
+            })
+        
+        before_avg = sum(c['before_ms'] for c in comparison) / len(comparison)
+        after_avg = sum(c['after_ms'] for c in comparison) / len(comparison)
+        return {
+            'before_average_ms': round(before_avg, 2),
+            'after_average_ms': round(after_avg, 2),
+            'speedup': round(before_avg / after_avg, 2) if after_avg > 0 else 0,
+            'results': comparison
+        }
+    
     def test_cache_performance(self) -> Dict[str, Any]:
         """Test caching system performance"""
         # Clear cache for clean test
-        api_cache.cache.clear()
+        api_cache.clear()
         
         # First call (should miss cache)
         start_time = time.time()
-        data1 = FunctionExecutor.get_stock_price('AAPL')
+        data1 = execute_function('get_stock_price', {'symbol': 'AAPL'})
         first_call_time = time.time() - start_time
         
         # Second call (should hit cache)
         start_time = time.time()
-        data2 = FunctionExecutor.get_stock_price('AAPL')
+        data2 = execute_function('get_stock_price', {'symbol': 'AAPL'})
         second_call_time = time.time() - start_time
         
         return {
-            'cache_working': data1 == data2,
+            'cache_working': data2.get('cached', False) and data1.get('timestamp') == data2.get('timestamp'),
+            'cache_age_seconds': data2.get('cache_age_seconds'),
+            'cache_stats': api_cache.stats(),
             'first_call_ms': round(first_call_time * 1000, 2),
             'second_call_ms': round(second_call_time * 1000, 2),
             'cache_speedup': round(first_call_time / second_call_time, 2) if second_call_time > 0 else 0
         }
     
+    def test_cache_backends(self, iterations: int = 2000, workers: int = 4) -> Dict[str, Any]:
+        """Benchmark the per-process cache against the shared SQLite cache"""
+        path = os.path.join(tempfile.mkdtemp(), 'cache_benchmark.sqlite3')
+        backends = {'memory': APICache(), 'sqlite': SharedAPICache(path)}
+        sample = {
+            'symbol': 'RELIANCE.NS', 'current_price': 2456.30, 'high': 2478.90, 'low': 2445.15,
+            'volume': 15600000, 'source': 'Yahoo Finance', 'timestamp': datetime.now().isoformat()
+        }
+        symbols = [f'SYM{i}.NS' for i in range(50)]
+        context = multiprocessing.get_context('fork')
+        
+        results = {}
+        for name, cache in backends.items():
+            start_time = time.perf_counter()
+            for i in range(iterations):
+                cache.set('get_stock_price', {'symbol': symbols[i % len(symbols)]}, sample, ttl=60)
+            set_time = time.perf_counter() - start_time
+            
+            start_time = time.perf_counter()
+            for i in range(iterations):
+                cache.get('get_stock_price', {'symbol': symbols[i % len(symbols)]})
+            get_time = time.perf_counter() - start_time
+            
+            # Forked workers asking for the same symbols, as under gunicorn preload_app
+            cache.clear()
+            upstream_calls = context.Value('i', 0)
+            processes = [
+                context.Process(target=_simulated_worker, args=(cache, symbols, upstream_calls))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            
+            results[name] = {
+                'set_us': round(set_time / iterations * 1e6, 2),
+                'get_us': round(get_time / iterations * 1e6, 2),
+                'upstream_calls': upstream_calls.value,
+                'cross_worker_hit_ratio': round(1 - upstream_calls.value / (workers * len(symbols)), 4)
+            }
+        
+        # numpy values, as quotes built from yfinance frames carry, must read back the same from both
+        numpy_sample = {**sample, 'current_price': np.float64(2456.3), 'volume': np.int64(15600000)}
+        for cache in backends.values():
+            cache.set('get_stock_price', {'symbol': 'NUMPY.NS'}, numpy_sample, ttl=60)
+        payloads = [cache.get('get_stock_price', {'symbol': 'NUMPY.NS'}) for cache in backends.values()]
+        
+        return {
+            'iterations': iterations,
+            'workers': workers,
+            'unique_symbols': len(symbols),
+            'backends': results,
+            'payloads_match': payloads[0] == payloads[1]
+        }
+    
+    def test_request_coalescing(self, concurrency: int = 20, upstream_latency: float = 0.2) -> Dict[str, Any]:
+        """Test that concurrent identical requests share one upstream fetch"""
+        coalescer = RequestCoalescer()
+        
+        def slow_fetch() -> Dict[str, Any]:
+            time.sleep(upstream_latency)
+            return {'symbol': 'RELIANCE.NS', 'current_price': 2456.30}
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                coalescer.do('get_stock_price', {'symbol': 'RELIANCE.NS'}, slow_fetch)
+            ))
+            for _ in range(concurrency)
+        ]
+        start_time = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        return {
+            'coalescing_working': coalescer.upstream_calls == 1 and len(results) == concurrency,
+            'concurrent_requests': concurrency,
+            'total_time_ms': round((time.time() - start_time) * 1000, 2),
+            'stats': coalescer.stats(),
+            'live_stats': request_coalescer.stats()
+        }
+    
+    def test_provider_routing(self) -> Dict[str, Any]:
+        """Test hedging and circuit breaking against local fake providers"""
+        behaviour = {'primary_latency': 0.01, 'primary_fails': False}
+        
+        def fake_primary(symbol: str) -> Optional[Dict[str, Any]]:
+            time.sleep(behaviour['primary_latency'])
+            if behaviour['primary_fails']:
+                raise ConnectionError("injected failure")
+            return {'symbol': symbol, 'source': 'primary'}
+        
+        def fake_secondary(symbol: str) -> Optional[Dict[str, Any]]:
+            time.sleep(0.05)
+            return {'symbol': symbol, 'source': 'secondary'}
+        
+        primary = Provider('primary', fake_primary, breaker=CircuitBreaker(min_calls=5, window=10, cooldown=60))
+        secondary = Provider('secondary', fake_secondary)
+        router = ProviderRouter([primary, secondary], timeout=5)
+        
+        def timed_call() -> Dict[str, Any]:
+            start_time = time.time()
+            result = router.call('TEST')
+            return {'source': (result or {}).get('source'), 'latency_ms': round((time.time() - start_time) * 1000, 2)}
+        
+        # Warm up latency stats, then make the primary slow: hedging should win
+        warmup = [timed_call() for _ in range(12)]
+        behaviour['primary_latency'] = 1.0
+        slow = timed_call()
+        
+        # Inject failures: the breaker should open and skip the primary entirely
+        behaviour.update({'primary_latency': 0.01, 'primary_fails': True})
+        failing = [timed_call() for _ in range(8)]
+        
+        # Quota denials are not failures: the breaker stays closed and a fail-fast denial reaches the caller
+        def quota_skipped(symbol: str) -> Optional[Dict[str, Any]]:
+            raise ProviderSkipped("injected quota denial")
+        
+        def quota_exhausted(symbol: str) -> Optional[Dict[str, Any]]:
+            raise QuotaExceededError("injected quota exhausted")
+        
+        skipping = Provider('skipping', quota_skipped, breaker=CircuitBreaker(min_calls=5, window=10, cooldown=60))
+        skip_router = ProviderRouter([skipping, Provider('secondary', fake_secondary)], timeout=5)
+        skipped = [skip_router.call('TEST') for _ in range(8)]
+        fail_fast_router = ProviderRouter([Provider('exhausted', quota_exhausted)], timeout=5,
+                                          propagate=(QuotaExceededError,))
+        try:
+            fail_fast_router.call('TEST')
+            fail_fast_raised = False
+        except QuotaExceededError:
+            fail_fast_raised = True
+        
+        return {
+            'hedging_working': slow['source'] == 'secondary' and slow['latency_ms'] < 500,
+            'circuit_breaker_working': primary.breaker.state == 'open' and all(r['source'] == 'secondary' for r in failing),
+            'quota_skips_working': (skipping.breaker.state == 'closed' and skipping.skips == 8
+                                    and all(r['source'] == 'secondary' for r in skipped) and fail_fast_raised),
+            'warmup_source': warmup[-1]['source'],
+            'slow_primary': slow,
+            'failing_primary': failing[-1],
+            'providers': router.stats(),
+            'live_providers': quote_router.stats()
+        }
+    
+    def test_history_conversion(self, repeats: int = 20) -> Dict[str, Any]:
+        """Benchmark history-to-response conversion for each period: iterrows vs vectorized"""
+        periods = {period: max(1, int(days * 252 / 365)) for period, days in PERIOD_DAYS.items()}
+        periods['ytd'] = 200
+        periods['max'] = 7500
+        
+        results = {}
+        for period, sessions in periods.items():
+            index = pd.date_range(end=datetime.now(), periods=sessions, freq='B', tz='Asia/Kolkata')
+            prices = np.random.default_rng(0).uniform(100, 3000, size=(sessions, 4))
+            hist = pd.DataFrame(prices, index=index, columns=['Open', 'High', 'Low', 'Close'])
+            hist['Volume'] = np.arange(sessions) * 1000
+            bars = _bars_from_frame(hist, "1d")
+            
+            # Before: every row converted in Python, then all but the last 10 discarded
+            start_time = time.perf_counter()
+            for _ in range(repeats):
+                legacy = [{
+                    "date": date.strftime("%Y-%m-%d"),
+                    "open": round(row['Open'], 2),
+                    "high": round(row['High'], 2),
+                    "low": round(row['Low'], 2),
+                    "close": round(row['Close'], 2),
+                    "volume": int(row['Volume'])
+                } for date, row in hist.iterrows()][-10:]
+            legacy_time = (time.perf_counter() - start_time) / repeats
+            
+            start_time = time.perf_counter()
+            for _ in range(repeats):
+                rows = _history_payload(bars, "1d", "rows")['history']
+            rows_time = (time.perf_counter() - start_time) / repeats
+            
+            start_time = time.perf_counter()
+            for _ in range(repeats):
+                _history_payload(bars, "1d", "columnar")
+            columnar_time = (time.perf_counter() - start_time) / repeats
+            
+            results[period] = {
+                'bars': sessions,
+                'iterrows_ms': round(legacy_time * 1000, 3),
+                'rows_ms': round(rows_time * 1000, 3),
+                'columnar_ms': round(columnar_time * 1000, 3),
+                'speedup': round(legacy_time / rows_time, 1) if rows_time > 0 else 0,
+                'same_rows': legacy == rows
+            }
+        
+        return {
+            'conversion_matches': all(r['same_rows'] for r in results.values()),
+            'periods': results
+        }
+    
+    def test_indicator_engine(self, bars_count: int = 5000, new_bars: int = 5) -> Dict[str, Any]:
+        """Test that incremental indicator updates match a full recompute, and time both"""
+        rng = np.random.default_rng(0)
+        closes = 1000 + np.cumsum(rng.normal(0, 5, bars_count))
+        spread = rng.uniform(0, 10, bars_count)
+        bars = np.vstack([
+            np.arange(bars_count) * 86400.0, closes, closes + spread, closes - spread, closes,
+            rng.uniform(1e5, 1e6, bars_count)
+        ])
+        
+        results = {}
+        for name in INDICATORS:
+            engine = IndicatorEngine(APICache(), results=APICache())
+            start_time = time.perf_counter()
+            engine.compute('TEST', '1d', bars[:, :-new_bars], name, points=50)
+            full_time = time.perf_counter() - start_time
+            
+            start_time = time.perf_counter()
+            incremental = engine.compute('TEST', '1d', bars, name, points=50)
+            incremental_time = time.perf_counter() - start_time
+            
+            reference = IndicatorEngine(APICache(), results=APICache()).compute('TEST', '1d', bars, name, points=50)
+            matches = all(
+                np.allclose(np.array(incremental['values'][k], dtype=float), np.array(v, dtype=float), equal_nan=True)
+                for k, v in reference['values'].items()
+            )
+            results[name] = {
+                'full_ms': round(full_time * 1000, 3),
+                'incremental_ms': round(incremental_time * 1000, 3),
+                'incremental_matches_full': matches,
+                'bars_computed': engine.bars_computed
+            }
+        
+        # A flat series has neither gains nor losses, so RSI is neutral rather than overbought
+        flat = np.vstack([np.arange(50) * 86400.0] + [np.full(50, 100.0)] * 4 + [np.full(50, 1e5)])
+        flat_rsi = IndicatorEngine(APICache(), results=APICache()).compute('FLAT', '1d', flat, 'rsi', points=10)
+        flat_neutral = all(v == 50 for v in flat_rsi['values']['rsi'] if v is not None)
+        
+        return {
+            'indicators_working': all(r['incremental_matches_full'] for r in results.values()) and flat_neutral,
+            'flat_rsi_neutral': flat_neutral,
+            'bars': bars_count,
+            'new_bars': new_bars,
+            'results': results
+        }
+    
+    def test_portfolio_risk(self, holdings: int = 500, days: int = 3 * 252) -> Dict[str, Any]:
+        """Benchmark the vectorized risk pass on a large synthetic portfolio"""
+        rng = np.random.default_rng(0)
+        market = rng.normal(0.0004, 0.01, days)
+        betas = rng.uniform(0.5, 1.5, holdings)
+        returns = market[:, None] * betas + rng.normal(0, 0.015, (days, holdings))
+        grid = np.arange(days + 1) * 86400.0
+        series = [(grid, 100 * np.cumprod(np.concatenate([[1.0], returns[:, i] + 1]))) for i in range(holdings)]
+        weights = rng.uniform(1, 10, holdings)
+        weights /= weights.sum()
+        
+        start_time = time.perf_counter()
+        closes = align_closes(grid, series)
+        aligned_returns = closes[1:] / closes[:-1] - 1
+        metrics = risk_metrics(weights, aligned_returns, market, confidence=0.95)
+        elapsed = time.perf_counter() - start_time
+        
+        return {
+            'risk_under_one_second': elapsed < 1.0,
+            'holdings': holdings,
+            'days': days,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'beta_error': round(float(np.abs(metrics['holding_betas'] - betas).mean()), 4),
+            'portfolio_beta': round(metrics['beta'], 3),
+            'var_historical_percent': round(metrics['var_historical'] * 100, 3),
+            'var_parametric_percent': round(metrics['var_parametric'] * 100, 3),
+            'max_drawdown_percent': round(metrics['max_drawdown'] * 100, 2),
+            'analytics_pool': analytics_executor.stats()
+        }
+    
+    def test_portfolio_valuation(self, lots: int = 5000, symbols: int = 200) -> Dict[str, Any]:
+        """Benchmark per-lot valuation: the old per-line loop vs grouped array arithmetic"""
+        rng = np.random.default_rng(0)
+        names = [f'SYM{i}.NS' for i in range(symbols)]
+        holdings = [
+            {'symbol': names[rng.integers(symbols)], 'quantity': int(rng.integers(1, 100)), 'avg_price': float(rng.uniform(50, 3000))}
+            for _ in range(lots)
+        ]
+        quotes = {name: float(rng.uniform(50, 3000)) for name in names}
+        
+        # Before: one price lookup and Python arithmetic per line
+        start_time = time.perf_counter()
+        loop_total = 0.0
+        for holding in holdings:
+            current_value = holding['quantity'] * quotes[holding['symbol']]
+            invested_value = holding['quantity'] * holding['avg_price']
+            pnl = current_value - invested_value
+            pnl_percent = (pnl / invested_value) * 100 if invested_value > 0 else 0
+            round(current_value, 2), round(invested_value, 2), round(pnl, 2), round(pnl_percent, 2)
+            loop_total += current_value
+        loop_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        unique_symbols, inverse = np.unique([h['symbol'] for h in holdings], return_inverse=True)
+        values = value_lots(
+            np.array([h['quantity'] for h in holdings], dtype=np.float64),
+            np.array([h['avg_price'] for h in holdings], dtype=np.float64),
+            np.array([quotes[name] for name in unique_symbols]),
+            inverse, len(unique_symbols)
+        )
+        array_time = time.perf_counter() - start_time
+        
+        return {
+            'valuation_matches': bool(np.isclose(values['symbol_current'].sum(), loop_total)),
+            'lots': lots,
+            'unique_symbols': len(unique_symbols),
+            'loop_ms': round(loop_time * 1000, 3),
+            'array_ms': round(array_time * 1000, 3)
+        }
+    
+    def test_quote_stream(self, clients: int = 30, symbols: int = 3, duration: float = 1.0,
+                          interval: float = 0.1) -> Dict[str, Any]:
+        """Test that streamed quotes cost upstream work per distinct symbol, not per client"""
+        names = [f'STREAM{i}_{os.getpid()}' for i in range(symbols)]
+        fetched = []
+        
+        def fetch(batch: List[str]) -> Dict[str, Dict[str, Any]]:
+            fetched.extend(batch)
+            # Every refresh moves the price so each interval produces an event
+            return {s: {'current_price': round(time.time(), 2), 'price_change': 0.1} for s in batch}
+        
+        stream = QuoteStream(interval=interval, heartbeat=interval, max_duration=duration,
+                             max_clients=clients, fetch=fetch)
+        received = [0] * clients
+        
+        def client(index: int) -> None:
+            for event in stream.subscribe([names[index % symbols]]):
+                if event.startswith('id:'):
+                    received[index] += 1
+        
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        # Every slot is taken while the clients run, so one more is refused
+        time.sleep(duration / 2)
+        refused = stream.subscribe([names[0]]) is None
+        for thread in threads:
+            thread.join()
+        
+        polled = int(clients * duration / interval)
+        return {
+            'stream_working': all(received) and len(fetched) < polled and refused,
+            'clients': clients,
+            'distinct_symbols': symbols,
+            'upstream_quotes': len(fetched),
+            'polling_equivalent_quotes': polled,
+            'events_per_client': round(sum(received) / clients, 1),
+            'stats': stream.stats()
+        }
+    
+    def test_symbol_matching(self, listings: int = 10000, repeats: int = 200) -> Dict[str, Any]:
+        """Benchmark company-mention matching against a symbol master padded to `listings` entries"""
+        master = SymbolMaster(SYMBOL_MASTER_PATH)
+        rng = np.random.default_rng(0)
+        letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+        padded = list(master._index[2].values())
+        for i in range(listings - len(padded)):
+            word = ''.join(rng.choice(letters, 7))
+            padded.append({
+                'symbol': f'SYN{i}.NS', 'ticker': f'SYN{i}', 'exchange': 'NSE',
+                'name': f'{word.title()} Industries Limited', 'aliases': [word]
+            })
+        
+        start_time = time.perf_counter()
+        master.build(padded)
+        build_time = time.perf_counter() - start_time
+        
+        cases = {
+            'Compare HDFC Bank and Reliance': ['HDFCBANK.NS', 'RELIANCE.NS'],
+            'how is tata motors doing today?': ['TATAMOTORS.NS'],
+            'tcs vs infy vs wipro': ['TCS.NS', 'INFY.NS', 'WIPRO.NS'],
+            'price of relaince': ['RELIANCE.NS'],
+            'Tell me about L&T': ['LT.NS'],
+            'Is it a good time to invest?': []
+        }
+        correct = sum(master.find_symbols(message) == expected for message, expected in cases.items())
+        
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            for message in cases:
+                master.find_symbols(message)
+        per_message = (time.perf_counter() - start_time) / (repeats * len(cases))
+        
+        return {
+            'matching_working': correct == len(cases) and per_message < 0.001,
+            'correct': correct,
+            'total_cases': len(cases),
+            'listings': master.stats()['listings'],
+            'build_ms': round(build_time * 1000, 1),
+            'per_message_ms': round(per_message * 1000, 4)
+        }
+    
+    def test_intent_routing(self, repeats: int = 500) -> Dict[str, Any]:
+        """Test that simple messages take the template fast path and only open questions need the LLM"""
+        router = IntentRouter(SymbolMaster(SYMBOL_MASTER_PATH))
+        cases = {
+            'hi': 'greeting',
+            'Good morning!': 'greeting',
+            'TCS': 'price',
+            'what is the price of HDFC Bank?': 'price',
+            'compare tcs and infy': 'comparison',
+            'show my portfolio': 'portfolio',
+            'any news about reliance': 'news',
+            'should I buy tcs?': OPEN_INTENT,
+            'which is better for the long term, tcs or infy?': OPEN_INTENT,
+            'Explain what a P/E ratio is': OPEN_INTENT
+        }
+        correct = sum(router.route(message)[0] == expected for message, expected in cases.items())
+        
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            for message in cases:
+                router.route(message)
+        per_message = (time.perf_counter() - start_time) / (repeats * len(cases))
+        
+        fast_path = sum(intent != OPEN_INTENT for intent in cases.values())
+        return {
+            'routing_working': correct == len(cases),
+            'correct': correct,
+            'total_cases': len(cases),
+            'llm_calls_avoided_ratio': round(fast_path / len(cases), 2),
+            'per_message_us': round(per_message * 1e6, 2)
+        }
+    
+    def test_llm_response_cache(self, model_latency: float = 0.05, repeats: int = 5) -> Dict[str, Any]:
+        """Compare cached and uncached LLM answers using a fake model with fixed latency"""
+        cache = LLMResponseCache(APICache(default_ttl=60), ttl=60, intents=['open'])
+        generations = []
+        
+        def generate() -> str:
+            time.sleep(model_latency)
+            generations.append(1)
+            return f'answer {len(generations)}'
+        
+        grounding = 'Symbol: RELIANCE.NS, Price: ₹2456.3'
+        variants = ['Should I buy Reliance?', 'should i buy reliance', '  SHOULD I BUY RELIANCE?! ']
+        
+        start_time = time.perf_counter()
+        first = cache.get_or_generate('open', 'test-model', variants[0], grounding, generate)
+        uncached_time = time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        answers = [cache.get_or_generate('open', 'test-model', variants[i % len(variants)], grounding, generate)
+                   for i in range(repeats)]
+        cached_time = (time.perf_counter() - start_time) / repeats
+        
+        # New grounding data or an intent that is not enabled must reach the model
+        moved = cache.get_or_generate('open', 'test-model', variants[0], grounding + '1', generate)
+        cache.get_or_generate('news', 'test-model', variants[0], grounding, generate)
+        
+        # Different questions in a non-Latin script keep separate entries ("What is inflation?"
+        # vs "Should I buy shares?"), and a message with no words at all is never cached
+        hindi = [cache.get_or_generate('open', 'test-model', question, grounding, generate)
+                 for question in ('महंगाई क्या है?', 'क्या मुझे शेयर खरीदना चाहिए?', 'महंगाई क्या है')]
+        bypassed = cache.bypassed
+        cache.get_or_generate('open', 'test-model', '?!', grounding, generate)
+        non_ascii_working = hindi[0] != hindi[1] and hindi[2] == hindi[0] and cache.bypassed == bypassed + 1
+        
+        return {
+            'cache_working': (all(a == first for a in answers) and moved != first and len(generations) == 6
+                              and non_ascii_working),
+            'non_ascii_working': non_ascii_working,
+            'model_calls': len(generations),
+            'uncached_ms': round(uncached_time * 1000, 2),
+            'cached_ms': round(cached_time * 1000, 4),
+            'stats': cache.stats()
+        }
+    
+    def test_chat_streaming(self, chunks: int = 10, chunk_latency: float = 0.02) -> Dict[str, Any]:
+        """Test streamed chat with a fake model: first token time, full-text persistence and failure handling"""
+        def fake_model():
+            for i in range(chunks):
+                time.sleep(chunk_latency)
+                yield f'part{i} '
+        
+        def failing_model():
+            yield 'partial '
+            raise RuntimeError('model dropped the connection')
+        
+        stream = ChatStream()
+        cache = LLMResponseCache(APICache(default_ttl=60), ttl=60, intents=[])
+        saved = []
+        
+        started = time.perf_counter()
+        events = list(stream.events({'intent': 'open'},
+                                    cache.stream_or_generate('open', 'fake', 'q', 'data', fake_model),
+                                    saved.append, started))
+        done = json.loads(events[-1].split('data: ', 1)[1])
+        failed = list(stream.events({'intent': 'open'}, failing_model(), saved.append, time.perf_counter()))
+        
+        return {
+            'streaming_working': (
+                len(events) == chunks + 2 and saved[0] == ''.join(f'part{i} ' for i in range(chunks))
+                and failed[-1].startswith('event: error') and saved[1] == 'partial '
+            ),
+            'ttft_ms': done['ttft_ms'],
+            'total_ms': done['total_ms'],
+            'stats': stream.stats()
+        }
+    
+    def test_chat_pipeline(self, io_latency: float = 0.05, requests: int = 5) -> Dict[str, Any]:
+        """Benchmark the chat stage graph against running the same steps one after another"""
+        writes = []
+        
+        def io(result=None):
+            time.sleep(io_latency)
+            return result
+        
+        def write(entry):
+            time.sleep(io_latency)
+            writes.append(entry)
+        
+        # Before: history, user save, quote, usage log, LLM and AI save in sequence
+        start_time = time.perf_counter()
+        for i in range(requests):
+            io([]), write(('user', i)), io({'price': 1}), io(), io('answer'), write(('ai', i))
+        sequential_time = (time.perf_counter() - start_time) / requests
+        
+        pipeline = ChatPipeline(ParallelExecutor(4, name='test-chat'), ParallelExecutor(1, name='test-bookkeeping'))
+        writes.clear()
+        start_time = time.perf_counter()
+        for i in range(requests):
+            pipeline.run([
+                Stage('route', lambda results: 'open'),
+                Stage('save_user', lambda results, i=i: write(('user', i)), background=True),
+                Stage('history', lambda results: io([]), after=['route']),
+                Stage('grounding', lambda results: io({'price': 1}), after=['route']),
+                Stage('answer', lambda results: io('answer'), after=['history', 'grounding']),
+                Stage('save_ai', lambda results, i=i: write(('ai', i)), after=['answer'], background=True)
+            ], label='test')
+        pipeline_time = (time.perf_counter() - start_time) / requests
+        
+        # Bookkeeping drains in submission order once the requests are done
+        deadline = time.time() + 5
+        while len(writes) < 2 * requests and time.time() < deadline:
+            time.sleep(io_latency)
+        expected = [(kind, i) for i in range(requests) for kind in ('user', 'ai')]
+        
+        return {
+            'pipeline_working': writes == expected and pipeline_time < sequential_time,
+            'sequential_ms': round(sequential_time * 1000, 1),
+            'pipeline_ms': round(pipeline_time * 1000, 1),
+            'stages': pipeline.stats()['stages']['test']
+        }
+    
     def test_prompt_safety(self, test_queries: List[str] = None) -> Dict[str, Any]:
         """Test for AI hallucination and prompt safety"""
         if not test_queries:
@@ -137,8 +753,23 @@ class ProductionPipeline:
                     'exception': str(e)
                 })
         
+        # Once every provider answers "no such symbol", the repeat lookup must not reach them
+        symbol = f'INVALID{int(time.time() * 1000)}'
+        provider_calls = []
+        original_call = quote_router.call
+        quote_router.call = lambda *args, **kwargs: provider_calls.append(args) or {}
+        try:
+            FunctionExecutor.get_stock_price(symbol)
+            start_time = time.perf_counter()
+            repeat = FunctionExecutor.get_stock_price(symbol)
+            repeat_time = time.perf_counter() - start_time
+        finally:
+            quote_router.call = original_call
+        
         return {
             'error_handling_rate': sum(1 for r in results if r['error_properly_handled']) / len(results),
+            'unknown_symbol_repeat_us': round(repeat_time * 1e6, 2),
+            'unknown_symbol_negative_cached': repeat.get('unknown_symbol', False) and len(provider_calls) == 1,
             'results': results
         }
     
@@ -162,6 +793,39 @@ class ProductionPipeline:
         
         return {'score': max(0, score), 'issues': issues}
     
+    def test_quota_governor(self, workers: int = 4, calls_per_worker: int = 5) -> Dict[str, Any]:
+        """Test that forked workers share one provider quota and background calls yield to interactive ones"""
+        path = os.path.join(tempfile.mkdtemp(), 'quota_test.sqlite3')
+        governor = QuotaGovernor('test', per_minute=10, burst=10, path=path, max_wait=0)
+        context = multiprocessing.get_context('fork')
+        granted = context.Value('i', 0)
+        
+        def worker() -> None:
+            for _ in range(calls_per_worker):
+                if governor.acquire(mode='degrade'):
+                    with granted.get_lock():
+                        granted.value += 1
+        
+        processes = [context.Process(target=worker) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        
+        # Two tokens in the bucket: background must leave them for interactive callers
+        reserved = QuotaGovernor('reserve', per_minute=60, burst=2, max_wait=0)
+        background = reserved.acquire(priority='background')
+        interactive = [reserved.acquire(priority='interactive', mode='degrade') for _ in range(2)]
+        
+        return {
+            'shared_quota_working': granted.value == governor.capacity,
+            'priority_working': not background and all(interactive),
+            'requested': workers * calls_per_worker,
+            'granted': granted.value,
+            'stats': governor.stats(),
+            'live_stats': alpha_vantage_quota.stats()
+        }
+    
     def run_full_pipeline(self) -> Dict[str, Any]:
         """Run complete production readiness test"""
         print("🚀 Running Production Pipeline Tests...")
@@ -0,0 +1,219 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from parallel_executor import ParallelExecutor
+
+class ProviderSkipped(Exception):
+    """Raised by a fetch that chose not to call its upstream, e.g. to stay within a quota"""
+
+class CircuitBreaker:
+    """Opens when a provider's recent error rate crosses a threshold, then retries after a cooldown"""
+
+    def __init__(self, error_threshold: float = 0.5, min_calls: int = 5, window: int = 20, cooldown: float = 30):
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.outcomes = deque(maxlen=window)
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_running:
+                # Let a single trial request through
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if self.state == 'half_open':
+                self._trial_running = False
+                if ok:
+                    self.state = 'closed'
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            self.outcomes.append(ok)
+            errors = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and errors / len(self.outcomes) >= self.error_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = 'open'
+        self.opened_at = time.time()
+        self.times_opened += 1
+
+class Provider:
+    """Upstream data source: fetch returns data, {} when it has no data, or None on failure"""
+
+    def __init__(self, name: str, fetch: Callable[..., Optional[Dict[str, Any]]],
+                 enabled: Callable[[], bool] = lambda: True, breaker: Optional[CircuitBreaker] = None,
+                 window: int = 100):
+        self.name = name
+        self.fetch = fetch
+        self.enabled = enabled
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.skips = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self.latencies.append(latency)
+            else:
+                self.errors += 1
+        self.breaker.record(ok)
+
+    def record_skip(self) -> None:
+        """The provider was not called; says nothing about its health"""
+        with self._lock:
+            self.skips += 1
+
+    def latency_percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(0.5)
+        p95 = self.latency_percentile(0.95)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'skips': self.skips,
+            'error_rate': round(self.errors / self.calls, 4) if self.calls else 0,
+            'p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 2) if p95 is not None else None,
+            'circuit': self.breaker.state,
+            'times_opened': self.breaker.times_opened,
+            'hedges_sent': self.hedges_sent,
+            'hedge_wins': self.hedge_wins
+        }
+
+class ProviderRouter:
+    """Routes a call across providers in priority order with circuit breakers and hedging.
+
+    The primary gets until its own p95 latency to answer; after that the
+    next provider is sent a hedged request and the first useful answer wins.
+
+    A fetch that raises ProviderSkipped, or one of the `propagate` exceptions,
+    is not counted against its provider's breaker. A `propagate` exception
+    (such as a fail-fast quota error) is re-raised to the caller when no
+    other provider answers.
+    """
+
+    def __init__(self, providers: List[Provider], timeout: float = 10, min_hedge_delay: float = 0.05,
+                 default_hedge_delay: float = 1.0, min_samples: int = 10, max_workers: int = 8,
+                 propagate: Tuple[type, ...] = ()):
+        self.providers = providers
+        self.propagate = propagate
+        self.timeout = timeout
+        self.min_hedge_delay = min_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        # A dedicated pool so hedged calls never wait behind the tasks that issue them
+        self.executor = ParallelExecutor(max_workers=max_workers)
+
+    def _hedge_delay(self, provider: Provider) -> float:
+        if len(provider.latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, provider.latency_percentile(0.95))
+
+    def _submit(self, provider: Provider, args: tuple):
+        def run():
+            start_time = time.time()
+            try:
+                result = provider.fetch(*args)
+            except ProviderSkipped:
+                provider.record_skip()
+                return None
+            except self.propagate:
+                provider.record_skip()
+                raise
+            except Exception:
+                result = None
+            provider.record(time.time() - start_time, result is not None)
+            return result
+        return self.executor.submit(run)
+
+    def call(self, *args, exclude: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Get the first useful result; {} if every provider answered without data, else None"""
+        candidates = [
+            p for p in self.providers
+            if p.enabled() and p.name not in (exclude or [])
+        ]
+        deadline = time.time() + self.timeout
+        pending = {}
+        answered_empty = 0
+        skipped = 0
+        error = None
+        queue = list(candidates)
+
+        def launch_next(hedge: bool) -> bool:
+            nonlocal skipped
+            while queue:
+                provider = queue.pop(0)
+                if not provider.breaker.allow():
+                    skipped += 1
+                    continue
+                if hedge:
+                    provider.hedges_sent += 1
+                pending[self._submit(provider, args)] = (provider, hedge)
+                return True
+            return False
+
+        launch_next(hedge=False)
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            # Wait for the oldest in-flight provider up to its p95, then hedge
+            oldest = next(iter(pending.values()))[0]
+            wait_for = min(remaining, self._hedge_delay(oldest)) if queue else remaining
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done:
+                launch_next(hedge=True)
+                continue
+            for future in done:
+                provider, hedged = pending.pop(future)
+                try:
+                    result = future.result()
+                except self.propagate as e:
+                    error, result = e, None
+                if result:
+                    if hedged:
+                        provider.hedge_wins += 1
+                    return result
+                if result == {}:
+                    answered_empty += 1
+            if not pending:
+                launch_next(hedge=False)
+
+        if candidates and answered_empty == len(candidates) and not skipped:
+            return {}
+        if error is not None:
+            raise error
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get health and latency stats for each provider"""
+        return {p.name: p.stats() for p in self.providers}
@@ -0,0 +1,184 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Any, Optional
+
+# How much of the bucket each priority may not dip into
+PRIORITY_RESERVES = {
+    'interactive': 0,
+    'background': 2
+}
+
+# Default behaviour when no token is available
+DEFAULT_MODES = {
+    'interactive': 'wait',
+    'background': 'degrade'
+}
+
+_policy: contextvars.ContextVar = contextvars.ContextVar('quota_policy', default=None)
+
+class QuotaExceededError(Exception):
+    pass
+
+class QuotaGovernor:
+    """Token bucket for a rate-limited provider, shared by all workers through a SQLite file.
+
+    Callers state a priority ('interactive' or 'background') and a mode:
+    'wait' blocks up to max_wait for a token, 'degrade' returns False so the
+    caller can fall back to cached or demo data, 'fail_fast' raises
+    QuotaExceededError.
+    """
+
+    def __init__(self, name: str, per_minute: float, per_day: int = 0, burst: Optional[int] = None,
+                 path: Optional[str] = None, max_wait: float = 2.0):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, int(per_minute))
+        self.per_day = per_day
+        self.path = path
+        self.max_wait = max_wait
+        self._state = {'tokens': float(self.capacity), 'updated': time.time(), 'day': '', 'day_count': 0}
+        self._counters = {'granted': 0, 'denied': 0, 'waited': 0, 'upstream_quota_errors': 0}
+        self._denied_by_priority = {priority: 0 for priority in PRIORITY_RESERVES}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def policy(self, priority: str = 'interactive', mode: Optional[str] = None):
+        """Set the priority and mode for quota-governed calls made in this context"""
+        token = _policy.set((priority, mode or DEFAULT_MODES[priority]))
+        try:
+            yield
+        finally:
+            _policy.reset(token)
+
+    def _connection(self) -> sqlite3.Connection:
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota ("
+                "name TEXT PRIMARY KEY, tokens REAL, updated REAL, day TEXT, day_count INTEGER)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _update(self, mutate) -> Any:
+        """Apply mutate(state) atomically across threads, and across processes when shared"""
+        if not self.path:
+            with self._lock:
+                return mutate(self._state)
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated, day, day_count FROM quota WHERE name = ?", (self.name,)
+            ).fetchone()
+            state = (
+                dict(zip(('tokens', 'updated', 'day', 'day_count'), row)) if row
+                else {'tokens': float(self.capacity), 'updated': time.time(), 'day': '', 'day_count': 0}
+            )
+            result = mutate(state)
+            conn.execute(
+                "INSERT OR REPLACE INTO quota (name, tokens, updated, day, day_count) VALUES (?, ?, ?, ?, ?)",
+                (self.name, state['tokens'], state['updated'], state['day'], state['day_count'])
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _refill(self, state: Dict[str, Any]) -> None:
+        now = time.time()
+        state['tokens'] = min(self.capacity, state['tokens'] + (now - state['updated']) * self.rate)
+        state['updated'] = now
+        today = date.today().isoformat()
+        if state['day'] != today:
+            state['day'] = today
+            state['day_count'] = 0
+
+    def _try_take(self, reserve: int) -> float:
+        """Take a token if available above the reserve; return 0 on success, else seconds to wait"""
+        def mutate(state):
+            self._refill(state)
+            if self.per_day and state['day_count'] >= self.per_day:
+                return float('inf')
+            if state['tokens'] - 1 >= reserve:
+                state['tokens'] -= 1
+                state['day_count'] += 1
+                return 0.0
+            return (reserve + 1 - state['tokens']) / self.rate
+        return self._update(mutate)
+
+    def acquire(self, priority: Optional[str] = None, mode: Optional[str] = None) -> bool:
+        """Take one call's worth of quota under the current (or given) policy"""
+        context_priority, context_mode = _policy.get() or ('interactive', None)
+        priority = priority or context_priority
+        mode = mode or context_mode or DEFAULT_MODES[priority]
+        reserve = PRIORITY_RESERVES[priority]
+
+        deadline = time.time() + self.max_wait
+        waited = False
+        while True:
+            wait_for = self._try_take(reserve)
+            if wait_for == 0:
+                with self._lock:
+                    self._counters['granted'] += 1
+                    self._counters['waited'] += int(waited)
+                return True
+            if mode == 'wait' and time.time() + wait_for <= deadline:
+                waited = True
+                time.sleep(wait_for)
+                continue
+            break
+
+        with self._lock:
+            self._counters['denied'] += 1
+            self._denied_by_priority[priority] += 1
+        if mode == 'fail_fast':
+            raise QuotaExceededError(f"{self.name} quota exhausted")
+        return False
+
+    def record_upstream_limit(self) -> None:
+        """The provider reported its quota exhausted; drain the bucket to match"""
+        def mutate(state):
+            self._refill(state)
+            state['tokens'] = 0.0
+        self._update(mutate)
+        with self._lock:
+            self._counters['upstream_quota_errors'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get quota usage: tokens left, daily usage and grant/deny counters"""
+        def read(state):
+            self._refill(state)
+            return dict(state)
+        state = self._update(read)
+        with self._lock:
+            return {
+                'provider': self.name,
+                'shared': bool(self.path),
+                'capacity': self.capacity,
+                'per_minute': round(self.rate * 60, 2),
+                'tokens_available': round(state['tokens'], 2),
+                'used_today': state['day_count'],
+                'per_day': self.per_day or None,
+                **self._counters,
+                'denied_by_priority': dict(self._denied_by_priority)
+            }
+
+# Global Alpha Vantage quota, shared by every worker on the host
+alpha_vantage_quota = QuotaGovernor(
+    'alpha_vantage',
+    per_minute=float(os.getenv('ALPHA_VANTAGE_CALLS_PER_MINUTE', 5)),
+    per_day=int(os.getenv('ALPHA_VANTAGE_CALLS_PER_DAY', 25)),
+    path=os.getenv('ALPHA_VANTAGE_QUOTA_PATH', os.path.join(tempfile.gettempdir(), 'saytrix_quota.sqlite3'))
+)
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Any, Callable, Iterator, List, Optional
+from functions import get_stock_contexts
+from cache_manager import api_cache
+from market_snapshot import board_row
+from quota_governor import alpha_vantage_quota
+
+logger = logging.getLogger(__name__)
+
+# Most symbols a single stream may subscribe to
+MAX_STREAM_SYMBOLS = 25
+
+class QuoteStream:
+    """One refresh loop per worker feeding every Server-Sent Events subscriber.
+
+    The loop quotes the union of all subscribed symbols once per interval
+    and publishes only rows whose price or change moved. Subscribers wait on
+    a condition variable and are sent the changed rows they asked for, so
+    upstream work follows the number of distinct symbols, not clients.
+
+    Each open stream holds a server thread, so a worker serves at most
+    `max_clients` of them; subscribe returns None past that and the client
+    polls instead.
+    """
+
+    def __init__(self, interval: float = 15, heartbeat: float = 15, max_duration: float = 300,
+                 max_clients: int = 8,
+                 fetch: Callable[[List[str]], Dict[str, Dict[str, Any]]] = get_stock_contexts):
+        self.fetch = fetch
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.max_duration = max_duration
+        self.max_clients = max_clients
+        self.version = 0
+        self.refreshes = 0
+        self.events_sent = 0
+        self.errors = 0
+        self.rejected = 0
+        self._subscriptions: Counter = Counter()
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._changed_at: Dict[str, int] = {}
+        self._clients = 0
+        self._pid = None
+        self._condition = threading.Condition()
+
+    def _ensure_started(self) -> None:
+        # Same per-worker start as the market snapshot: threads do not survive the fork
+        with self._condition:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        thread = threading.Thread(target=self._run, name='quote-stream', daemon=True)
+        thread.start()
+
+    def _run(self) -> None:
+        with alpha_vantage_quota.policy(priority='background'):
+            while True:
+                time.sleep(self.interval)
+                with self._condition:
+                    symbols = list(self._subscriptions)
+                if symbols:
+                    self.refresh(symbols)
+
+    def refresh(self, symbols: List[str]) -> int:
+        """Quote the symbols and publish the rows that changed; returns how many did"""
+        try:
+            # Rows another worker fetched this interval are reused through the shared cache
+            rows = {}
+            for symbol in symbols:
+                row = api_cache.get("quote_stream", {"symbol": symbol})
+                if row is not None:
+                    rows[symbol] = row
+            misses = [symbol for symbol in symbols if symbol not in rows]
+            if misses:
+                for symbol, context in self.fetch(misses).items():
+                    if "error" not in context:
+                        rows[symbol] = board_row(symbol, context)
+                        api_cache.set("quote_stream", {"symbol": symbol}, rows[symbol], ttl=self.interval)
+            self.refreshes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Quote stream refresh failed: {e}")
+            return 0
+
+        with self._condition:
+            changed = [symbol for symbol, row in rows.items() if self._rows.get(symbol) != row]
+            if changed:
+                self.version += 1
+                for symbol in changed:
+                    self._rows[symbol] = rows[symbol]
+                    self._changed_at[symbol] = self.version
+                self._condition.notify_all()
+        return len(changed)
+
+    def _event(self, rows: List[Dict[str, Any]], version: int) -> str:
+        self.events_sent += 1
+        return f"id: {version}\nevent: quotes\ndata: {json.dumps({'quotes': rows, 'version': version})}\n\n"
+
+    def subscribe(self, symbols: List[str]) -> Optional[Iterator[str]]:
+        """SSE stream of board rows for the symbols, or None when the worker is at max_clients.
+
+        The stream sends a full snapshot first, then changes only. Versions
+        are local to a worker, so a reconnecting client always starts from a
+        full snapshot rather than resuming from its last event id.
+        """
+        self._ensure_started()
+        with self._condition:
+            if self._clients >= self.max_clients:
+                self.rejected += 1
+                return None
+            self._subscriptions.update(symbols)
+            self._clients += 1
+        events = self._events(symbols)
+        # Started here so closing the stream releases the slot even if it is never read
+        next(events)
+        return events
+
+    def _events(self, symbols: List[str]) -> Iterator[str]:
+        try:
+            yield ''
+            with self._condition:
+                missing = [symbol for symbol in symbols if symbol not in self._rows]
+            if missing:
+                self.refresh(missing)
+            deadline = time.time() + self.max_duration
+            # Clients reconnect automatically after the stream ends
+            yield "retry: 3000\n\n"
+
+            with self._condition:
+                seen = self.version
+                rows = [self._rows[s] for s in symbols if s in self._rows]
+            if rows:
+                yield self._event(rows, seen)
+
+            last_sent = time.time()
+            while time.time() < deadline:
+                with self._condition:
+                    if self.version == seen:
+                        self._condition.wait(self.heartbeat)
+                    version = self.version
+                    rows = [self._rows[s] for s in symbols if s in self._rows and self._changed_at[s] > seen]
+                seen = version
+                if rows:
+                    yield self._event(rows, version)
+                    last_sent = time.time()
+                elif time.time() - last_sent >= self.heartbeat:
+                    # A comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    last_sent = time.time()
+        finally:
+            with self._condition:
+                self._subscriptions.subtract(symbols)
+                for symbol in symbols:
+                    if self._subscriptions[symbol] <= 0:
+                        # Nobody watches it any more; drop it so a later subscriber gets a fresh quote
+                        del self._subscriptions[symbol]
+                        self._rows.pop(symbol, None)
+                        self._changed_at.pop(symbol, None)
+                self._clients -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get subscriber counts and refresh counters"""
+        with self._condition:
+            return {
+                'clients': self._clients,
+                'max_clients': self.max_clients,
+                'rejected': self.rejected,
+                'distinct_symbols': len(self._subscriptions),
+                'interval_seconds': self.interval,
+                'version': self.version,
+                'refreshes': self.refreshes,
+                'events_sent': self.events_sent,
+                'errors': self.errors
+            }
+
+def parse_symbols(raw: Optional[str]) -> List[str]:
+    """Symbols from a comma-separated query parameter, de-duplicated and capped"""
+    symbols = [s.strip().upper() for s in (raw or '').split(',') if s.strip()]
+    return list(dict.fromkeys(symbols))[:MAX_STREAM_SYMBOLS]
+
+# Global quote stream; keep QUOTE_STREAM_MAX_CLIENTS well under GUNICORN_THREADS
+# so streams never take every thread a worker has for ordinary requests
+quote_stream = QuoteStream(
+    interval=float(os.getenv('QUOTE_STREAM_INTERVAL', 15)),
+    max_duration=float(os.getenv('QUOTE_STREAM_MAX_SECONDS', 300)),
+    max_clients=int(os.getenv('QUOTE_STREAM_MAX_CLIENTS', 8))
+)
@@ -0,0 +1,125 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+from cache_manager import freeze
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class _InFlightCall:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class RequestCoalescer:
+    """Single-flight execution: one upstream fetch per (function, params) at a time"""
+
+    def __init__(self, lock_dir: Optional[str] = None, timeout: float = 30):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+        self.cross_process_coalesced = 0
+        self._calls: Dict[Tuple, _InFlightCall] = {}
+        self._lock = threading.Lock()
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, function_name: str, params: Dict[str, Any], fetch: Callable[[], Any],
+           recheck: Optional[Callable[[], Any]] = None) -> Any:
+        """Run fetch, or wait for an identical in-flight fetch and reuse its result.
+
+        recheck is called after waiting on another worker's fetch and should
+        return the value that worker stored in the shared cache, or None.
+        """
+        key = (function_name, freeze(params))
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlightCall()
+                self._calls[key] = call
+            else:
+                self.coalesced_calls += 1
+
+        if not leader:
+            if call.event.wait(self.timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # The leader is stuck; fetch independently rather than fail
+            return self._fetch(fetch)
+
+        try:
+            call.result = self._fetch_across_processes(key, fetch, recheck)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def is_in_flight(self, function_name: str, params: Dict[str, Any]) -> bool:
+        """Check whether a fetch for this call is already running in this worker"""
+        with self._lock:
+            return (function_name, freeze(params)) in self._calls
+
+    def _fetch(self, fetch: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.upstream_calls += 1
+        return fetch()
+
+    def _fetch_across_processes(self, key: Tuple, fetch: Callable[[], Any],
+                                recheck: Optional[Callable[[], Any]]) -> Any:
+        if not self.lock_dir or recheck is None or fcntl is None:
+            return self._fetch(fetch)
+
+        name = hashlib.md5(repr(key).encode()).hexdigest()
+        with open(os.path.join(self.lock_dir, f"{name}.lock"), 'a') as handle:
+            waited = False
+            deadline = time.time() + self.timeout
+            while True:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.time() >= deadline:
+                        return self._fetch(fetch)
+                    waited = True
+                    time.sleep(0.01)
+            try:
+                if waited:
+                    # Another worker just fetched this; reuse what it cached
+                    cached = recheck()
+                    if cached is not None:
+                        with self._lock:
+                            self.cross_process_coalesced += 1
+                        return cached
+                return self._fetch(fetch)
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get upstream and avoided call counters"""
+        with self._lock:
+            return {
+                'upstream_calls': self.upstream_calls,
+                'coalesced_calls': self.coalesced_calls,
+                'cross_process_coalesced': self.cross_process_coalesced,
+                'upstream_calls_avoided': self.coalesced_calls + self.cross_process_coalesced,
+                'in_flight': len(self._calls)
+            }
+
+# Global coalescer instance; coalescing across workers needs the shared cache
+request_coalescer = RequestCoalescer(
+    lock_dir=os.getenv('COALESCE_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'saytrix_locks'))
+    if os.getenv('CACHE_BACKEND', 'memory').lower() == 'sqlite' else None
+)
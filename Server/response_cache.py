@@ -0,0 +1,110 @@
+import os
+import time
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, Any, Callable, Iterable, Iterator
+from cache_manager import APICache
+from symbol_master import tokenize
+
+def normalize_message(message: str) -> str:
+    """Case-folded words in any script, so case, spacing and punctuation do not split cache entries"""
+    return ' '.join(word.casefold() for word in tokenize(unicodedata.normalize('NFKC', message)))
+
+class LLMResponseCache:
+    """Cache of LLM answers keyed by normalized message, model and grounding data.
+
+    The grounding is the exact data and conversation text placed in the
+    prompt, hashed, so an answer is reused only while the quote it was based
+    on and the turns before it are unchanged. Only
+    intents listed in `intents` are cached, and never messages that normalize
+    to nothing (no words to tell them apart); failed generations raise and
+    are never stored.
+    """
+
+    def __init__(self, cache: APICache, ttl: int = 300, intents: Iterable[str] = ('open',)):
+        self.cache = cache
+        self.ttl = ttl
+        self.intents = set(intents)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.hit_seconds = 0.0
+        self.generate_seconds = 0.0
+        self.generations = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, message: str, grounding: str) -> Dict[str, str]:
+        return {
+            'model': model,
+            'message': normalize_message(message),
+            'grounding': hashlib.sha256(grounding.encode()).hexdigest()
+        }
+
+    def get_or_generate(self, intent: str, model: str, message: str, grounding: str,
+                        generate: Callable[[], str]) -> str:
+        """Return a cached answer for the prompt, or generate and cache one"""
+        return ''.join(self.stream_or_generate(intent, model, message, grounding, lambda: [generate()]))
+
+    def stream_or_generate(self, intent: str, model: str, message: str, grounding: str,
+                           stream: Callable[[], Iterable[str]]) -> Iterator[str]:
+        """Yield a cached answer as one chunk, or the model's chunks as they arrive.
+
+        A streamed answer is cached only once the model has finished; a
+        consumer that stops early (client disconnect) leaves nothing behind.
+        """
+        start_time = time.perf_counter()
+        key = self.key(model, message, grounding)
+        enabled = intent in self.intents and bool(key['message'])
+        if enabled:
+            cached = self.cache.get('llm_response', key)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.hit_seconds += time.perf_counter() - start_time
+                yield cached
+                return
+
+        parts = []
+        for chunk in stream():
+            parts.append(chunk)
+            yield chunk
+        response_text = ''.join(parts)
+        elapsed = time.perf_counter() - start_time
+        with self._lock:
+            self.generations += 1
+            self.generate_seconds += elapsed
+            if enabled:
+                self.misses += 1
+            else:
+                self.bypassed += 1
+        if enabled and response_text:
+            self.cache.set('llm_response', key, response_text, ttl=self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit rate and cached vs generated latency"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'intents': sorted(self.intents),
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+                'avg_hit_ms': round(self.hit_seconds / self.hits * 1000, 3) if self.hits else None,
+                'avg_generate_ms': round(self.generate_seconds / self.generations * 1000, 1) if self.generations else None,
+                'cache': self.cache.stats()
+            }
+
+# Global LLM response cache; LLM_CACHE_INTENTS is a comma-separated list, empty to disable
+llm_response_cache = LLMResponseCache(
+    APICache(
+        default_ttl=int(os.getenv('LLM_CACHE_TTL', 300)),
+        max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 1000)),
+        max_bytes=8 * 1024 * 1024
+    ),
+    ttl=int(os.getenv('LLM_CACHE_TTL', 300)),
+    intents=[i.strip() for i in os.getenv('LLM_CACHE_INTENTS', 'open').split(',') if i.strip()]
+)
@@ -0,0 +1,231 @@
+import os
+import re
+import csv
+import time
+import logging
+import threading
+import unicodedata
+from typing import Dict, Any, List, Optional, Tuple
+from functions import invalidate_unknown_symbols
+
+logger = logging.getLogger(__name__)
+
+SYMBOL_MASTER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'symbol_master.csv')
+
+# Yahoo suffix per listing exchange
+EXCHANGE_SUFFIXES = {'NSE': '.NS', 'BSE': '.BO'}
+
+# Words dropped from the ends of company names before indexing
+NAME_NOISE = {'the', 'limited', 'ltd', 'inc', 'incorporated', 'corp', 'corporation', 'company', 'co', 'plc'}
+
+# Tickers that are also everyday words only match when written in capitals,
+# and these words are never fuzzy-matched against company names
+COMMON_WORDS = {
+    'a', 'all', 'am', 'an', 'and', 'are', 'at', 'be', 'buy', 'by', 'can', 'compare', 'do', 'for', 'go',
+    'has', 'have', 'how', 'i', 'if', 'in', 'is', 'it', 'its', 'me', 'market', 'my', 'now', 'of', 'on',
+    'or', 'price', 'prices', 'sell', 'share', 'shares', 'should', 'so', 'stock', 'stocks', 'tell',
+    'than', 'that', 'the', 'there', 'this', 'to', 'today', 'trend', 'up', 'value', 'was', 'what',
+    'when', 'which', 'who', 'why', 'will', 'with', 'you', 'your', 'about', 'invest', 'news', 'better'
+}
+
+# Shortest token the fuzzy index will correct
+FUZZY_MIN_LENGTH = 5
+
+def _combining_marks() -> str:
+    """Regex class body for the BMP's combining marks, which \\w does not match (Devanagari vowel signs)"""
+    marks = [code for code in range(0x300, 0x10000) if unicodedata.category(chr(code)).startswith('M')]
+    ranges = []
+    for code in marks:
+        if ranges and code == ranges[-1][1] + 1:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    return ''.join(f"\\u{start:04x}-\\u{end:04x}" for start, end in ranges)
+
+# Letters, digits and combining marks in any script; underscore separates words
+WORD_CHARS = rf"(?:[^\W_]|[{_combining_marks()}])+"
+TOKEN_PATTERN = re.compile(rf"{WORD_CHARS}(?:[&.-]{WORD_CHARS})*")
+
+# Pattern kinds, strongest first; a phrase claimed by a stronger kind keeps it
+ALIAS, NAME, TICKER = range(3)
+
+def tokenize(text: str) -> List[str]:
+    """Word tokens of a message; '&', '.' and '-' inside a word are kept (L&T, BAJAJ-AUTO)"""
+    return TOKEN_PATTERN.findall(text.replace("'", "").replace("’", ""))
+
+def _deletes(token: str) -> set:
+    """The token and every variant with one character removed"""
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+class SymbolMaster:
+    """Listed symbols, names and aliases with one-pass matching of company mentions.
+
+    Every ticker, name and alias is a phrase in a word-level trie, so a
+    single left-to-right walk over a message finds all mentions, preferring
+    the longest phrase at each position ("HDFC Bank" over "HDFC"). Words
+    that match nothing can be corrected through a one-edit deletion index
+    ("relaince" -> RELIANCE). The listing file is reloaded when it changes.
+    """
+
+    def __init__(self, path: str = SYMBOL_MASTER_PATH, check_interval: float = 60):
+        self.path = path
+        self.check_interval = check_interval
+        self.messages_matched = 0
+        self.fuzzy_matches = 0
+        self.reloads = 0
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._index: Tuple[Dict[str, Any], Dict[str, set], Dict[str, Dict[str, Any]]] = ({}, {}, {})
+        self._maybe_reload(force=True)
+
+    @staticmethod
+    def _phrase(text: str, strip_noise: bool = False) -> List[str]:
+        tokens = [t.lower() for t in tokenize(text)]
+        if strip_noise:
+            while tokens and tokens[-1] in NAME_NOISE:
+                tokens.pop()
+            while tokens and tokens[0] in NAME_NOISE:
+                tokens.pop(0)
+        return tokens
+
+    def _read_listings(self) -> List[Dict[str, Any]]:
+        listings = []
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                ticker = (row.get('symbol') or '').strip().upper()
+                if not ticker:
+                    continue
+                exchange = (row.get('exchange') or '').strip().upper()
+                listings.append({
+                    'symbol': ticker + EXCHANGE_SUFFIXES.get(exchange, ''),
+                    'ticker': ticker,
+                    'name': (row.get('name') or '').strip(),
+                    'exchange': exchange,
+                    'aliases': [a.strip() for a in (row.get('aliases') or '').split(';') if a.strip()]
+                })
+        return listings
+
+    def build(self, listings: List[Dict[str, Any]]) -> None:
+        """Index listings ({symbol, ticker, name, exchange, aliases}) and swap them in"""
+        trie: Dict[str, Any] = {}
+        fuzzy: Dict[str, set] = {}
+        by_symbol = {}
+
+        def add(tokens: List[str], symbol: str, kind: int, exact_case: bool) -> None:
+            if not tokens:
+                return
+            node = trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            if None not in node or node[None][1] > kind:
+                node[None] = (symbol, kind, exact_case)
+            if len(tokens) == 1 and not exact_case and len(tokens[0]) >= FUZZY_MIN_LENGTH:
+                for key in _deletes(tokens[0]):
+                    fuzzy.setdefault(key, set()).add(symbol)
+
+        for listing in listings:
+            symbol = listing['symbol']
+            by_symbol[symbol] = listing
+            for alias in listing['aliases']:
+                add(self._phrase(alias), symbol, ALIAS, False)
+            add(self._phrase(listing['name'], strip_noise=True), symbol, NAME, False)
+            for ticker in {listing['ticker'], symbol}:
+                tokens = self._phrase(ticker)
+                # Short or everyday-word tickers (IT, ON, ALL) only count when capitalised
+                exact_case = len(ticker) <= 2 or ticker.lower() in COMMON_WORDS
+                add(tokens, symbol, TICKER, exact_case)
+
+        self._index = (trie, fuzzy, by_symbol)
+
+    def _maybe_reload(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                logger.error(f"Symbol master not readable: {e}")
+                return
+            if mtime == self._mtime:
+                return
+            self.build(self._read_listings())
+            first_load = self._mtime is None
+            self._mtime = mtime
+            if not first_load:
+                self.reloads += 1
+                # Symbols cached as unknown may be listed now
+                invalidate_unknown_symbols()
+            logger.info(f"Symbol master loaded: {len(self._index[2])} listings")
+
+    def mentions(self, message: str, fuzzy: bool = True) -> Tuple[List[str], List[str]]:
+        """Listed companies mentioned in the message, in order, and the lowercased words left over"""
+        self._maybe_reload()
+        trie, fuzzy_index, _ = self._index
+        words = tokenize(message)
+        lowered = [w.lower() for w in words]
+        found = []
+        unmatched = []
+        i = 0
+        while i < len(words):
+            node = trie
+            match, end = None, i
+            for j in range(i, len(words)):
+                node = node.get(lowered[j])
+                if node is None:
+                    break
+                terminal = node.get(None)
+                if terminal and (not terminal[2] or words[i:j + 1] == [w.upper() for w in words[i:j + 1]]):
+                    match, end = terminal[0], j + 1
+            if match:
+                found.append(match)
+                i = end
+            else:
+                unmatched.append(lowered[i])
+                i += 1
+
+        if not found and fuzzy:
+            for word in list(unmatched):
+                if len(word) < FUZZY_MIN_LENGTH or word in COMMON_WORDS:
+                    continue
+                candidates = set().union(*(fuzzy_index.get(key, ()) for key in _deletes(word)))
+                # An ambiguous correction is worse than none
+                if len(candidates) == 1:
+                    found.append(candidates.pop())
+                    unmatched.remove(word)
+                    self.fuzzy_matches += 1
+
+        self.messages_matched += 1
+        return list(dict.fromkeys(found)), unmatched
+
+    def find_symbols(self, message: str, fuzzy: bool = True) -> List[str]:
+        """Every listed company mentioned in the message, in order of first mention"""
+        return self.mentions(message, fuzzy)[0]
+
+    def lookup(self, text: str) -> Optional[str]:
+        """The first listed symbol mentioned in the text, or None"""
+        symbols = self.find_symbols(text)
+        return symbols[0] if symbols else None
+
+    def listing(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return self._index[2].get(symbol)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get listing counts and match counters"""
+        trie, fuzzy, by_symbol = self._index
+        return {
+            'path': self.path,
+            'listings': len(by_symbol),
+            'fuzzy_keys': len(fuzzy),
+            'messages_matched': self.messages_matched,
+            'fuzzy_matches': self.fuzzy_matches,
+            'reloads': self.reloads
+        }
+
+# Global symbol master
+symbol_master = SymbolMaster(
+    os.getenv('SYMBOL_MASTER_PATH', SYMBOL_MASTER_PATH),
+    check_interval=float(os.getenv('SYMBOL_MASTER_CHECK_INTERVAL', 60))
+)
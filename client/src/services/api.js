@@ -27,6 +27,39 @@ export const api = {
   sendMessage: (message, conversationId) =>
     axios.post(`${API_BASE}/chat`, { message, conversation_id: conversationId }),
   
+  // Streamed reply: onEvent(name, data) is called for meta, token, done and error events
+  streamMessage: async (message, conversationId, onEvent) => {
+    const token = localStorage.getItem('saytrix_token')
+    const response = await fetch(`${API_BASE}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {})
+      },
+      body: JSON.stringify({ message, conversation_id: conversationId })
+    })
+    if (!response.ok || !response.body) {
+      throw new Error(`Stream failed with status ${response.status}`)
+    }
+    
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      const events = buffer.split('\n\n')
+      buffer = events.pop()
+      for (const block of events) {
+        const lines = block.split('\n')
+        const name = lines.find(line => line.startsWith('event: '))?.slice(7)
+        const data = lines.find(line => line.startsWith('data: '))?.slice(6)
+        if (name && data) onEvent(name, JSON.parse(data))
+      }
+    }
+  },
+  
   quickAction: (action) =>
     axios.post(`${API_BASE}/quick-action`, { action }),
   
@@ -37,6 +70,10 @@ export const api = {
   getMarketData: () =>
     axios.get(`${API_BASE}/market-data`),
   
+  // Server-Sent Events stream of changed quotes for the given symbols
+  openMarketStream: (symbols) =>
+    new EventSource(`${API_BASE}/market-stream?symbols=${encodeURIComponent(symbols.join(','))}`),
+  
   analyzeStock: (symbol) =>
     axios.post(`${API_BASE}/stock-analysis`, { symbol }),
   
@@ -44,6 +81,12 @@ export const api = {
   calculatePortfolio: (holdings) =>
     axios.post(`${API_BASE}/portfolio-calculate`, { holdings }),
   
+  getPortfolio: () =>
+    axios.get(`${API_BASE}/portfolio`),
+  
+  savePortfolio: (holdings) =>
+    axios.put(`${API_BASE}/portfolio`, { holdings }),
+  
   // Analytics
   getUserUsage: (days = 30) =>
     axios.get(`${API_BASE}/analytics/usage?days=${days}`),